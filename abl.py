@@ -9,19 +9,27 @@ import logging
 from mpmath import *
 from sim_analysis_functions import *
 from numpy import random
+import numpy
 from poisson_process import *
-from simulation import Simulation, ISParms
+from simulation import Simulation, ISParms, SplittingParms
 from unif_bfb_gen_repair import UniformizationBFBOpt
 from bfb_optimization import BFBOpt
 from regular_simulation import RegularSimulation
+from batch_simulation import BatchRegularSimulation
+from restart_simulation import RestartSimulation
+from regenerative_simulation import RegenerativeSimulation
 from sector_fail_model import *
+from parallel_sim import run_blocks, new_seed
+from loss_pattern import num_patterns, is_sector_loss, format_pattern
+from is_tuning import FBProbTuner
+from checkpoint import Checkpoint, CheckpointWriter, load_checkpoint
 import getopt
 
 class Simulate:
     def __init__(self, code_desc, num_components, mission_time, is_type,
                  is_parms, sector_fail_model, component_fail_dists,
                  component_repair_dists, fail_check_type=None,
-                 critical_region_check=True):
+                 critical_region_check=True, batch_size=None, sector_cmc=False):
 
         # Importance sampling type
         self.is_type = is_type
@@ -30,69 +38,186 @@ class Simulate:
             self.sim = UniformizationBFBOpt(code_desc, num_components, mission_time,
                                             is_parms, sector_fail_model, component_fail_dists,
                                             component_repair_dists, fail_check_type,
-                                            critical_region_check)
+                                            critical_region_check, sector_cmc)
             self.sim.init()
 
         elif self.is_type == Simulation.IS_BFB_NO_FORCING_OPT:
             self.sim = BFBOpt(code_desc, num_components, mission_time, is_parms, sector_fail_model,
                               component_fail_dists, component_repair_dists, fail_check_type,
-                              critical_region_check)
+                              critical_region_check, sector_cmc)
+            self.sim.init()
+
+        elif self.is_type == Simulation.REGULAR and batch_size is not None:
+            self.sim = BatchRegularSimulation(code_desc, num_components, mission_time, None, sector_fail_model,
+                                              component_fail_dists, component_repair_dists, fail_check_type,
+                                              critical_region_check, batch_size)
             self.sim.init()
 
         elif self.is_type == Simulation.REGULAR:
             self.sim = RegularSimulation(code_desc, num_components, mission_time, None, sector_fail_model,
                                          component_fail_dists, component_repair_dists, fail_check_type,
-                                         critical_region_check)
+                                         critical_region_check, sector_cmc)
+            self.sim.init()
+
+        elif self.is_type == Simulation.RESTART:
+            self.sim = RestartSimulation(code_desc, num_components, mission_time, is_parms, sector_fail_model,
+                                         component_fail_dists, component_repair_dists, fail_check_type,
+                                         critical_region_check, sector_cmc)
+            self.sim.init()
+
+        elif self.is_type == Simulation.REGENERATIVE:
+            self.sim = RegenerativeSimulation(code_desc, num_components, mission_time, None, sector_fail_model,
+                                              component_fail_dists, component_repair_dists, fail_check_type,
+                                              critical_region_check, sector_cmc)
             self.sim.init()
 
-    def run_simulation(self, num_iterations=10):
-        run_samples = []
-        run_patterns = []
+    ##
+    # Run num_iterations iterations (in fixed-size blocks, possibly on
+    # several worker processes).  The result for a given seed does not
+    # depend on the number of workers.
+    #
+    # If target_re (and/or max_time, in seconds) is given, num_iterations
+    # is only a budget: the run stops after the first block at which the
+    # relative error of the estimate is at most target_re.  The number
+    # of iterations actually run is kept in self.iterations_run.
+    #
+    # With checkpoint_file the progress is kept in checkpoint (a
+    # Checkpoint, see checkpoint.py) and written there periodically.  A
+    # checkpoint that has been started is continued: its seed is used
+    # and num_iterations counts its iterations too.
+    #
+    # With tune_iterations (importance sampling only) fb_prob is first
+    # tuned on pilot runs of that many iterations (see is_tuning.py); 
+    # self.tuning is then (initial fb_prob, tuned fb_prob, estimated
+    # variance reduction).
+    #
+    def run_simulation(self, num_iterations=10, workers=1, seed=None, target_re=None, max_time=None,
+                       checkpoint=None, checkpoint_file=None, tune_iterations=None):
+        start = None
+        if checkpoint is not None and checkpoint.is_started():
+            seed = checkpoint.seed
+            start = (checkpoint.stats, checkpoint.next_block, checkpoint.iterations_run)
+
+        if seed is None:
+            seed = new_seed()
+        self.seed = seed
+
+        self.tuning = None
+        if tune_iterations is not None:
+            self.tuning = FBProbTuner(self.sim, tune_iterations).tune(seed)
+
+        bytes_per_sector = 4096.0
+
+        done = None
+        if target_re is not None or max_time is not None:
+            done = StoppingRule(target_re, max_time)
+            if start is not None:
+                done.stats.merge(checkpoint.stats)
+                if done.reached():
+                    num_iterations = checkpoint.iterations_run
+
+        on_block = None
+        if checkpoint_file is not None:
+            if checkpoint is None:
+                checkpoint = Checkpoint()
+            checkpoint.seed = seed
+            on_block = CheckpointWriter(checkpoint, checkpoint_file)
+
+        (stats, self.iterations_run) = run_blocks(self, num_iterations, seed, workers, done=done,
+                                                  start=start, on_block=on_block)
+
+        if on_block is not None:
+            on_block.save()
+
+        pattern_counts = {}
+        pattern_probs = {}
+        for pattern in stats.get_patterns():
+            pattern_counts[format_pattern(pattern)] = int(stats.pattern_counts[pattern])
+            pattern_probs[format_pattern(pattern)] = stats.pattern_sums[pattern] / self.iterations_run
+
+        avg_bytes_lost = ((stats.loss_sum * bytes_per_sector)/ self.iterations_run)
+        return (stats, avg_bytes_lost, pattern_counts, pattern_probs)
+
+    ##
+    # Run one block of iterations.  The samples are summarized in a
+    # SampleAccumulator so that blocks can be merged exactly (see 
+    # parallel_sim) without keeping the samples around.
+    #
+    def run_block(self, num_iterations):
+        eras_code = self.sim.eras_code
+        (hits, misses) = (eras_code.check_cache_hits, eras_code.check_cache_misses)
+
+        stats = self.run_samples(num_iterations)
+
+        stats.cache_hits = eras_code.check_cache_hits - hits
+        stats.cache_misses = eras_code.check_cache_misses - misses
+        return stats
+
+    ##
+    # Run num_iterations iterations into a new SampleAccumulator
+    #
+    def run_samples(self, num_iterations):
+        stats = SampleAccumulator(num_patterns(self.sim.num_components))
         if self.sim.sector_failure_model is not None:
             num_sectors_per_disk = self.sim.sector_failure_model.total_num_sectors
         else:
             num_sectors_per_disk = 1000000000.0
 
-        bytes_per_sector = 4096.0
-        avg_bytes_lost = 0
-        distinct_patterns = {}
-        pattern_probs = {}
-
-        for i in range(num_iterations):
-            (sample, pattern, critical_region) = self.sim.run_iteration()
-            if not distinct_patterns.has_key(pattern):
-                distinct_patterns[pattern] = 0
-                pattern_probs[pattern] = 0
-            distinct_patterns[pattern] += 1
-            pattern_probs[pattern] += sample
+        # The vectorized engine hands over whole arrays of samples
+        if isinstance(self.sim, BatchRegularSimulation):
+            (samples, patterns, critical_regions) = self.sim.run_arrays(num_iterations)
+            if self.sim.sector_failure_model is None:
+                bytes_lost = numpy.where(samples != 0, float(num_sectors_per_disk), 0)
+            else:
+                bytes_lost = numpy.where(is_sector_loss(patterns), samples, critical_regions*samples)
+            stats.add_samples(samples, patterns, bytes_lost)
+            return stats
 
+        for (sample, pattern, critical_region) in self.sim.run_iterations(num_iterations):
+            bytes_lost = 0
             if sample != 0:
-                (num_disks, num_sectors) = eval(pattern)
                 if self.sim.sector_failure_model is None:
-                    avg_bytes_lost += num_sectors_per_disk
-                elif num_sectors == 0:
-                    avg_bytes_lost += (critical_region*sample)
+                    bytes_lost = num_sectors_per_disk
+                elif not is_sector_loss(pattern):
+                    bytes_lost = (critical_region*sample)
                 else:
-                    avg_bytes_lost += 1
-
-            run_samples.append(sample)
-            run_patterns.append(pattern)
+                    # One sector per (weighted) sector loss
+                    bytes_lost = sample
 
-        for pattern in pattern_probs.keys():
-            pattern_probs[pattern] /= num_iterations
+            stats.add(sample, pattern, bytes_lost)
 
-        avg_bytes_lost = ((avg_bytes_lost * bytes_per_sector)/ num_iterations)
-        return (run_samples, avg_bytes_lost, distinct_patterns, pattern_probs)
+        return stats
 
 def usage(arg):
     print arg, ": -h [--help] -m <mission_time> [--mission_time <mission_time>]"
     print "-n <num_components> [--num_components <num_components>] -i <num_iterations> [--iterations <num_iterations>]"
     print "-C <code_file> [--code_file <code_file>]"
     print "-k <num_data_symbols>"
+    print "-s <reg|regen|restart|(\"restart\", (factor_1, factor_2, ...))|(\"unif\"|\"bfb\", forcing_prob, fb_prob)> [--sim_mode ...]"
+    print "-b <batch_size> [--batch_size <batch_size>] (vectorized engine, regular mode only)"
+    print "-p <mp|float> [--precision <mp|float>]"
+    print "-w <num_workers> [--workers <num_workers>] [--seed <seed>]"
+    print "--target-re <relative_error, e.g. 5%> [--max-time <seconds>] (-i is then the iteration budget)"
+    print "--checkpoint <file> | --resume <file> [--extend <num_iterations>]"
+    print "--tune-fb <pilot_iterations> (tune fb_prob before the run, importance sampling only)"
+    print "--sector-cmc (add the probability of sector losses instead of sampling them, MDS codes only)"
     print ""
 
     sys.exit(2)
 
+def parse_opts(argv):
+    try:
+        return getopt.getopt(argv, "hs:m:n:i:f:cC:S:F:R:k:b:p:w:", ["help",  "sim_mode", "mission_time",
+                                                                 "num_components", "iterations", "fault_check",
+                                                                 "critical_check", "code_file", "sector_failure_model",
+                                                                 "component_fail_dist", "component_repair_dist", "kt",
+                                                                 "batch_size=", "precision=", "workers=", "seed=", "target-re=",
+                                                                 "max-time=", "checkpoint=", "resume=", "extend=", "tune-fb=", "sector-cmc"])
+    except:
+        usage(sys.argv[0])
+        print "getopts excepted"
+        sys.exit(1)
+
 def get_parms():
 
     sim_mode = None
@@ -111,16 +236,49 @@ def get_parms():
     component_repair_dist = None
     bad_opt = None
     kt = None
-
-    try:
-        (opts, args) = getopt.getopt(sys.argv[1:], "hs:m:n:i:f:cC:S:F:R:k:", ["help",  "sim_mode", "mission_time",
-                                                                             "num_components", "iterations", "fault_check",
-                                                                             "critical_check", "code_file", "sector_failure_model",
-                                                                             "component_fail_dist", "component_repair_dist", "kt"])
-    except:
+    batch_size = None
+    workers = 1
+    seed = None
+    target_re = None
+    max_time = None
+    tune_iterations = None
+    sector_cmc = False
+    splitting_factors = None
+
+    (opts, args) = parse_opts(sys.argv[1:])
+
+    # A resumed run is rebuilt from the options it was started with; 
+    # only the number of workers and the time budget can be changed.
+    checkpoint = None
+    checkpoint_file = None
+    extend = None
+    for o, a in opts:
+        if o == "--resume":
+            checkpoint = load_checkpoint(a)
+            checkpoint_file = a
+        elif o == "--checkpoint":
+            checkpoint_file = a
+        elif o == "--extend":
+            extend = int(a)
+
+    if checkpoint is not None:
+        overrides = [(o, a) for (o, a) in opts if o in ("-w", "--workers", "--max-time")]
+        (opts, args) = parse_opts(checkpoint.args)
+        opts = opts + overrides
+    elif extend is not None:
+        print "--extend needs --resume <checkpoint_file>"
         usage(sys.argv[0])
-        print "getopts excepted"
-        sys.exit(1)
+    elif checkpoint_file is not None:
+        checkpoint = Checkpoint(sys.argv[1:])
+
+    # The arithmetic must be selected before any distribution is built
+    precision = PRECISION_MP
+    for o, a in opts:
+        if o in ("-p", "--precision"):
+            if a not in (PRECISION_MP, PRECISION_FLOAT):
+                usage(sys.argv[0])
+            precision = a
+    set_precision(precision)
 
     for o, a in opts:
         if o in ("-h", "--help"):
@@ -166,7 +324,7 @@ def get_parms():
                 sector_fail_prob = mpf(sector_fail_prob)
                 sector_failure_model = BERSectorFailModel(total_num_sectors, None, None, sector_fail_prob, None, None)
 
-            elif len(sec_fail_tup) == 6: # type, total_num_sectors, sector_fail_prob, sectors_per_region, scrub_interval, request_rate, write_ratio
+            elif len(sec_fail_tup) == 7: # type, total_num_sectors, sector_fail_prob, sectors_per_region, scrub_interval, request_rate, write_ratio
                 (type, total_num_sectors, sector_fail_prob, sectors_per_region, scrub_interval, request_rate, write_ratio) = eval(a)
 
                 total_num_sectors = mpf(total_num_sectors)
@@ -180,16 +338,25 @@ def get_parms():
                     sector_failure_model = NoScrubSectorFailModel(total_num_sectors, sectors_per_region, scrub_interval, sector_fail_prob, request_rate, write_ratio)
                 elif type == "deterministic":
                     sector_failure_model = DeterministicScrubSectorFailModel(total_num_sectors, sectors_per_region, scrub_interval, sector_fail_prob, request_rate, write_ratio)
+                elif type == "accumulating":
+                    sector_failure_model = AccumulatingSectorFailModel(total_num_sectors, sectors_per_region, scrub_interval, sector_fail_prob, request_rate, write_ratio)
                 else:
                     bad_opt = o + " : " + type
                     break
             else:
-                bad_opt = o + " : num args must be 2 or 6"
+                bad_opt = o + " : num args must be 2 or 7"
                 break
 
         elif o in ("-s", "--sim_mode"):
             if a == "reg":
                 sim_mode = Simulation.REGULAR
+            elif a == "restart":
+                sim_mode = Simulation.RESTART
+            elif a == "regen":
+                sim_mode = Simulation.REGENERATIVE
+            elif eval(a)[0] == "restart":
+                sim_mode = Simulation.RESTART
+                splitting_factors = eval(a)[1]
             else:
                 (is_type, is_forcing_prob, is_fb_prob) = eval(a)
                 if is_type == "bfb":
@@ -200,8 +367,8 @@ def get_parms():
                     bad_opt = o + " : " + is_type
                     break
 
-                is_forcing_prob = mpf(is_forcing_prob)
-                is_fb_prob = mpf(is_fb_prob)
+                is_forcing_prob = arith.real(is_forcing_prob)
+                is_fb_prob = arith.real(is_fb_prob)
 
         elif o in ("-m", "--mission_time"):
             mission_time = float(a)
@@ -234,11 +401,51 @@ def get_parms():
         elif o in ("-n", "--num_components"):
             num_components = int(a)
 
+        elif o in ("-b", "--batch_size"):
+            batch_size = int(a)
+
+        elif o in ("-w", "--workers"):
+            workers = int(a)
+
+        elif o == "--seed":
+            seed = int(a)
+
+        elif o == "--target-re":
+            if a.endswith("%"):
+                target_re = float(a[:-1]) / 100
+            else:
+                target_re = float(a)
+
+        elif o == "--max-time":
+            max_time = float(a)
+
+        elif o == "--tune-fb":
+            tune_iterations = int(a)
+
+        elif o == "--sector-cmc":
+            sector_cmc = True
+
+    # Extending a run adds exactly extend iterations to it
+    if extend is not None:
+        iterations = checkpoint.iterations_run + extend
+        target_re = None
 
     if sim_mode is None:
         sim_mode = Simulation.IS_UNIF_BFB_NO_FORCING_OPT
-        is_forcing_prob = mpf(0.5)
-        is_fb_prob = mpf(0.3)
+        is_forcing_prob = arith.real(0.5)
+        is_fb_prob = arith.real(0.3)
+
+    if tune_iterations is not None and sim_mode in (Simulation.REGULAR, Simulation.RESTART, Simulation.REGENERATIVE):
+        print "--tune-fb needs an importance sampling mode"
+        usage(sys.argv[0])
+
+    if sector_cmc is True and batch_size is not None:
+        print "--sector-cmc is not supported by the vectorized engine"
+        usage(sys.argv[0])
+
+    if sector_failure_model is not None and sector_failure_model.time_dependent is True and batch_size is not None:
+        print "Time dependent sector failure models are not supported by the vectorized engine"
+        usage(sys.argv[0])
 
     if code_file is None:
         code_file = "rs_10_4"
@@ -275,25 +482,29 @@ def get_parms():
         sector_fail_prob = mpf(sfp)
         sector_failure_model = BERSectorFailModel(total_num_sectors, None, None, sector_fail_prob, None, None)
 
-
+    if sim_mode == Simulation.RESTART:
+        is_parms = SplittingParms(splitting_factors)
+    else:
+        is_parms = ISParms(forcing_prob=is_forcing_prob, fb_prob=is_fb_prob)
 
     return (sim_mode, mission_time, iterations, fault_check, critical_region_check,
-            code_file, num_components, ISParms(forcing_prob=is_forcing_prob, fb_prob=is_fb_prob),
-            sector_failure_model, component_fail_dist, component_repair_dist, kt)
+            code_file, num_components, is_parms,
+            sector_failure_model, component_fail_dist, component_repair_dist, kt, batch_size,
+            workers, seed, target_re, max_time, checkpoint, checkpoint_file, tune_iterations, sector_cmc)
 
 def do_it():
 
     (sim_mode, mission_time, iterations, fault_check, critical_region_check,
      code_file, num_components, is_parms, sector_failure_model,
-     component_fail_dists, component_repair_dists, kt) = get_parms()
+     component_fail_dists, component_repair_dists, kt, batch_size, workers, seed,
+     target_re, max_time, checkpoint, checkpoint_file, tune_iterations, sector_cmc) = get_parms()
 
     simulation = Simulate(code_file, num_components, mission_time, sim_mode, is_parms,
                           sector_failure_model, component_fail_dists, component_repair_dists,
-                          fault_check, critical_region_check)
-
-    (run_samples, avg_bytes_lost, distinct_patterns, pattern_probs) = simulation.run_simulation(iterations)
+                          fault_check, critical_region_check, batch_size, sector_cmc)
 
-    samples = Samples(run_samples)
+    (samples, avg_bytes_lost, distinct_patterns, pattern_probs) = simulation.run_simulation(iterations, workers, seed, target_re, max_time,
+                                                                                             checkpoint, checkpoint_file, tune_iterations)
 
     mean = samples.calcMean()
 
@@ -306,9 +517,23 @@ def do_it():
 
     print "\n*******************\n"
     print "Average bytes lost per usable TB: %.5f" % abl
+    print "Seed: %d" % simulation.seed
+    print "Iterations: %d" % simulation.iterations_run
+    print "Relative error (90%% confidence): %.2f%%" % relative_error
+    if simulation.tuning is not None:
+        (initial_fb_prob, tuned_fb_prob, reduction) = simulation.tuning
+        print "Tuned fb_prob: %.3f (from %.3f)" % (tuned_fb_prob, initial_fb_prob)
+        if reduction is None:
+            print "Estimated variance reduction: unknown (no data loss in a pilot run)"
+        else:
+            print "Estimated variance reduction: %.2fx" % reduction
+    hit_rate = samples.get_cache_hit_rate()
+    if hit_rate is not None:
+        print "Failure check cache: %d hits, %d misses (%.2f%% hit rate)" % (samples.cache_hits, samples.cache_misses,
+                                                                              100*hit_rate)
     print "\n*******************\n"
     print "DL patterns: (disks, sectors): num instances"
-    for key in distinct_patterns.keys():
+    for key in sorted(distinct_patterns.keys()):
         print key, ": ", distinct_patterns[key]
     print "\n*******************\n"
 
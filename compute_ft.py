@@ -0,0 +1,94 @@
+import os
+import sys
+sys.path.append(os.getenv('PWD') + '/lib')
+
+import erasure_code
+from erasure_code import ErasureCode
+from fault_tolerance import compute_tables, write_tables, DEFAULT_MAX_PATTERNS, DEFAULT_SAMPLES
+import getopt
+
+##
+# Compute the fault tolerance vector and the disk sector conditional
+# fault tolerance table of a code (see lib/fault_tolerance.py) and write
+# them into its code file, so that the FTV and DSCFT checks can be used
+# with it.
+#
+
+def usage(arg):
+    print arg, ": -h [--help] -C <code_file> [--code_file <code_file>]"
+    print "-f <rank|mel> [--fault_check <rank|mel>] (check the tables are computed with, default rank)"
+    print "-o <code_file> [--output <code_file>] (default: update the code file)"
+    print "-w <num_workers> [--workers <num_workers>] [--seed <seed>]"
+    print "--max-patterns <num_patterns> (entries with more patterns are sampled, default %d)" % DEFAULT_MAX_PATTERNS
+    print "--samples <num_samples> (patterns per sampled entry, default %d)" % DEFAULT_SAMPLES
+    print ""
+
+    sys.exit(2)
+
+def get_parms():
+    code_file = None
+    output_file = None
+    fault_check = ErasureCode.CHECK_RANK
+    workers = 1
+    seed = 0
+    max_patterns = DEFAULT_MAX_PATTERNS
+    num_samples = DEFAULT_SAMPLES
+
+    try:
+        (opts, args) = getopt.getopt(sys.argv[1:], "hC:f:o:w:", ["help", "code_file=", "fault_check=", "output=",
+                                                                "workers=", "seed=", "max-patterns=", "samples="])
+    except getopt.GetoptError:
+        usage(sys.argv[0])
+
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage(sys.argv[0])
+        elif o in ("-C", "--code_file"):
+            code_file = a
+        elif o in ("-f", "--fault_check"):
+            if a == "rank":
+                fault_check = ErasureCode.CHECK_RANK
+            elif a == "mel":
+                fault_check = ErasureCode.CHECK_MEL
+            else:
+                print "Unknown fault check: %s" % a
+                usage(sys.argv[0])
+        elif o in ("-o", "--output"):
+            output_file = a
+        elif o in ("-w", "--workers"):
+            workers = int(a)
+        elif o == "--seed":
+            seed = int(a)
+        elif o == "--max-patterns":
+            max_patterns = int(a)
+        elif o == "--samples":
+            num_samples = int(a)
+
+    if code_file is None:
+        print "Must give a code file."
+        usage(sys.argv[0])
+
+    if output_file is None:
+        output_file = code_file
+
+    return (code_file, output_file, fault_check, workers, seed, max_patterns, num_samples)
+
+def do_it():
+    (code_file, output_file, fault_check, workers, seed, max_patterns, num_samples) = get_parms()
+
+    (ftv, dscft) = compute_tables(code_file, fault_check, workers, seed, max_patterns, num_samples)
+
+    print "Fault tolerance vector (erased symbols: probability of data loss)"
+    for i in range(len(ftv)):
+        print "%d: %s" % (i+1, ftv[i])
+
+    print "\nDisk sector conditional fault tolerance (failed disks, sector erasures: probability of data loss)"
+    for d in range(len(dscft)):
+        for s in range(len(dscft[d])):
+            print "%d, %d: %s" % (d, s, dscft[d][s])
+
+    write_tables(erasure_code.code_dir + code_file, erasure_code.code_dir + output_file, ftv, dscft)
+    print "\nWrote %s" % (erasure_code.code_dir + output_file)
+
+if __name__ == "__main__":
+    do_it()
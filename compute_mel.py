@@ -0,0 +1,78 @@
+import os
+import sys
+sys.path.append(os.getenv('PWD') + '/lib')
+
+import erasure_code
+from erasure_code import ErasureCode
+from minimal_erasures import compute_minimal_erasures
+from code_file import replace_sections
+import getopt
+
+##
+# Compute the minimal erasures list of an XOR code from its tanner graph
+# (see lib/minimal_erasures.py) and write it into its code file, so that
+# the MEL check can be used with it.
+#
+
+MEL_SECTION = "[minimal fault sets]"
+
+def usage(arg):
+    print arg, ": -h [--help] -C <code_file> [--code_file <code_file>]"
+    print "-o <code_file> [--output <code_file>] (default: update the code file)"
+    print "-w <num_workers> [--workers <num_workers>]"
+    print ""
+
+    sys.exit(2)
+
+def get_parms():
+    code_file = None
+    output_file = None
+    workers = 1
+
+    try:
+        (opts, args) = getopt.getopt(sys.argv[1:], "hC:o:w:", ["help", "code_file=", "output=", "workers="])
+    except getopt.GetoptError:
+        usage(sys.argv[0])
+
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage(sys.argv[0])
+        elif o in ("-C", "--code_file"):
+            code_file = a
+        elif o in ("-o", "--output"):
+            output_file = a
+        elif o in ("-w", "--workers"):
+            workers = int(a)
+
+    if code_file is None:
+        print "Must give a code file."
+        usage(sys.argv[0])
+
+    if output_file is None:
+        output_file = code_file
+
+    return (code_file, output_file, workers)
+
+def do_it():
+    (code_file, output_file, workers) = get_parms()
+
+    code = ErasureCode(code_file, ErasureCode.CHECK_RANK, use_failure_table=False)
+    if code.type == ErasureCode.TYPE_MDS:
+        print "Minimal erasures are only computed for XOR codes: every %d symbols of an MDS code are one." % (code.m+1)
+        sys.exit(1)
+
+    mel = compute_minimal_erasures(code_file, workers)
+
+    print "Minimal erasures (erased symbols: count)"
+    weights = sorted(set([len(erasure) for erasure in mel]))
+    for weight in weights:
+        print "%d: %d" % (weight, len([erasure for erasure in mel if len(erasure) == weight]))
+    if len(weights) > 0:
+        print "Hamming distance: %d" % weights[0]
+
+    replace_sections(erasure_code.code_dir + code_file, erasure_code.code_dir + output_file,
+                     [(MEL_SECTION, [repr(erasure) for erasure in mel])])
+    print "\nWrote %s" % (erasure_code.code_dir + output_file)
+
+if __name__ == "__main__":
+    do_it()
@@ -0,0 +1,219 @@
+##
+# Vectorized variant of the regular (non-IS) simulation.
+#
+# Instead of advancing one mission at a time, a batch of missions is
+# kept in NumPy arrays (one row per mission, one column per component)
+# and all missions are moved forward one event at a time together.
+# The statistics produced are the same as the ones produced by
+# RegularSimulation.run_iteration().
+#
+
+from regular_simulation import *
+from numpy import random
+import numpy
+
+class BatchRegularSimulation(RegularSimulation):
+
+    def __init__(self, code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type=None, critical_region_check=True, batch_size=1024):
+        RegularSimulation.__init__(self, code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type, critical_region_check)
+
+        # Number of missions advanced together
+        self.batch_size = batch_size
+
+    ##
+    # Initialize the simulation
+    #
+    def init(self):
+        RegularSimulation.init(self)
+
+        # Per-component distribution parameters as arrays
+        self.fail_shape = numpy.array([float(d.shape) for d in self.component_fail_dists])
+        self.fail_scale = numpy.array([float(d.scale) for d in self.component_fail_dists])
+        self.fail_location = numpy.array([float(d.location) for d in self.component_fail_dists])
+        self.repair_shape = numpy.array([float(d.shape) for d in self.component_repair_dists])
+        self.repair_scale = numpy.array([float(d.scale) for d in self.component_repair_dists])
+        self.repair_location = numpy.array([float(d.location) for d in self.component_repair_dists])
+
+        if self.sector_failure_model is not None:
+            self.total_num_sectors = int(self.sector_failure_model.total_num_sectors)
+            self.prob_bad_sector = float(self.prob_bad_sector)
+
+    ##
+    # Draw failure (or repair) times for the given component ids
+    #
+    def draw_fail(self, comps):
+        return self.fail_scale[comps] * random.weibull(self.fail_shape[comps]) + self.fail_location[comps]
+
+    def draw_repair(self, comps):
+        return self.repair_scale[comps] * random.weibull(self.repair_shape[comps]) + self.repair_location[comps]
+
+    ##
+    # Yield (sample, pattern, critical_region) for num_iterations missions
+    #
+    def run_iterations(self, num_iterations):
+        done = 0
+        while done < num_iterations:
+            batch = min(self.batch_size, num_iterations - done)
+            (samples, patterns, critical_regions) = self.run_arrays(batch)
+            for i in range(batch):
+                yield (samples[i], patterns[i], critical_regions[i])
+            done += batch
+
+    ##
+    # Run num_iterations missions, batch_size at a time
+    #
+    # @return arrays (samples, patterns, critical_regions)
+    #
+    def run_arrays(self, num_iterations):
+        results = []
+        done = 0
+        while done < num_iterations:
+            batch = min(self.batch_size, num_iterations - done)
+            (samples, num_disks, num_sectors, critical_regions) = self.run_batch(batch)
+            results.append((samples, encode_pattern(num_disks, num_sectors), critical_regions))
+            done += batch
+
+        if len(results) == 1:
+            return results[0]
+        return tuple(numpy.concatenate(arrays) for arrays in zip(*results))
+
+    ##
+    # Run num_missions missions together
+    #
+    # @return arrays (samples, num_disks, num_sectors, critical_regions)
+    #
+    def run_batch(self, num_missions):
+        n = self.num_components
+        all_comps = numpy.tile(numpy.arange(n), (num_missions, 1))
+
+        # Failure times of available components (inf once failed)
+        fail_times = self.draw_fail(all_comps)
+        # Repair times of failed components (inf while available)
+        repair_times = numpy.empty((num_missions, n))
+        repair_times.fill(numpy.inf)
+        repair_start = numpy.zeros((num_missions, n))
+        failed = numpy.zeros((num_missions, n), dtype=bool)
+        num_failed = numpy.zeros(num_missions, dtype=int)
+
+        samples = numpy.zeros(num_missions)
+        num_disks = numpy.zeros(num_missions, dtype=int)
+        num_sectors = numpy.zeros(num_missions, dtype=int)
+        critical_regions = numpy.zeros(num_missions)
+
+        active = numpy.arange(num_missions)
+
+        while len(active) > 0:
+            fail_comp = fail_times[active].argmin(1)
+            fail_time = fail_times[active, fail_comp]
+            repair_comp = repair_times[active].argmin(1)
+            repair_time = repair_times[active, repair_comp]
+
+            is_fail = fail_time < repair_time
+            event_time = numpy.where(is_fail, fail_time, repair_time)
+
+            # Missions whose next event is past the mission time are done
+            in_mission = event_time <= self.mission_time
+
+            # Repairs: draw a new failure time for the repaired component
+            rep = in_mission & ~is_fail
+            rows = active[rep]
+            comps = repair_comp[rep]
+            failed[rows, comps] = False
+            repair_times[rows, comps] = numpy.inf
+            fail_times[rows, comps] = self.draw_fail(comps) + event_time[rep]
+            num_failed[rows] -= 1
+
+            # Failures: draw a repair time for the failed component
+            fl = in_mission & is_fail
+            rows = active[fl]
+            comps = fail_comp[fl]
+            curr_time = event_time[fl]
+            failed[rows, comps] = True
+            fail_times[rows, comps] = numpy.inf
+            repair_times[rows, comps] = self.draw_repair(comps) + curr_time
+            repair_start[rows, comps] = curr_time
+            num_failed[rows] += 1
+
+            lost = self.check_data_loss(rows, curr_time, failed, num_failed, repair_times, repair_start, num_disks, num_sectors, critical_regions)
+            samples[lost] = 1
+
+            still_active = numpy.zeros(num_missions, dtype=bool)
+            still_active[active[in_mission]] = True
+            still_active[lost] = False
+            active = numpy.nonzero(still_active)[0]
+
+        return (samples, num_disks, num_sectors, critical_regions)
+
+    ##
+    # Critical region of each mission in rows (see Simulation.run_iteration)
+    #
+    def get_critical_region(self, rows, curr_time, repair_times, repair_start):
+        next_repair_idx = repair_times[rows].argmin(1)
+        next_repair = repair_times[rows, next_repair_idx]
+        return ((next_repair - curr_time) / (next_repair - repair_start[rows, next_repair_idx])) * self.total_num_sectors
+
+    ##
+    # Check the missions in rows (that just saw a component failure at
+    # curr_time) for data loss.  Fills in the loss pattern and critical
+    # region of the missions that lost data.
+    #
+    # @return row ids of the missions that lost data
+    #
+    def check_data_loss(self, rows, curr_time, failed, num_failed, repair_times, repair_start, num_disks, num_sectors, critical_regions):
+        lost = []
+
+        # Check to see if #erasures >= minimum disk fault tolerance of erasure code
+        chk = num_failed[rows] >= self.eras_code.min_disk_failures
+        if chk.any():
+            chk_rows = rows[chk]
+            if self.eras_code.type == ErasureCode.TYPE_MDS:
+                disk_lost = num_failed[chk_rows] > self.eras_code.m
+            else:
+                disk_lost = self.eras_code.are_failures([list_to_bm(numpy.nonzero(failed[r])[0].tolist()) for r in chk_rows])
+
+            if disk_lost.any():
+                lost_rows = chk_rows[disk_lost]
+                num_disks[lost_rows] = num_failed[lost_rows]
+                num_sectors[lost_rows] = 0
+                if self.critical_region_flg is True and self.sector_failure_model is not None:
+                    critical_regions[lost_rows] = self.get_critical_region(lost_rows, curr_time[chk][disk_lost], repair_times, repair_start)
+                lost.extend(lost_rows)
+
+                keep = ~numpy.in1d(rows, lost_rows)
+                rows = rows[keep]
+                curr_time = curr_time[keep]
+
+        # Put check in to see if #erasures == HD-1 and see if there are any sector failures
+        if self.sector_failure_model is None:
+            return numpy.array(lost, dtype=int)
+
+        chk = num_failed[rows] >= (self.eras_code.min_disk_failures-1)
+        if not chk.any():
+            return numpy.array(lost, dtype=int)
+
+        chk_rows = rows[chk]
+        if self.critical_region_flg is True:
+            critical_region = self.get_critical_region(chk_rows, curr_time[chk], repair_times, repair_start)
+        else:
+            critical_region = numpy.empty(len(chk_rows))
+            critical_region.fill(self.total_num_sectors-1)
+
+        # Draw latent sector errors for every available component
+        avail = ~failed[chk_rows]
+        bad = random.uniform(size=avail.shape) < self.prob_bad_sector
+        sector_index = random.randint(0, self.total_num_sectors-1, size=avail.shape)
+        hit = avail & bad & (sector_index < critical_region[:, numpy.newaxis])
+
+        for i in numpy.nonzero(hit.any(1))[0]:
+            r = chk_rows[i]
+            sector_failures = [[] for j in range(self.num_components)]
+            for comp in numpy.nonzero(hit[i])[0]:
+                sector_failures[comp].append(sector_index[i, comp])
+
+            if self.eras_code.is_failure(list(numpy.nonzero(failed[r])[0]), sector_failures) is True:
+                num_disks[r] = num_failed[r]
+                num_sectors[r] = 1
+                critical_regions[r] = critical_region[i]
+                lost.append(r)
+
+        return numpy.array(lost, dtype=int)
@@ -15,12 +15,15 @@ class BFBOpt(Simulation):
          self.fb_prob = self.is_parms.fb_prob
           
          # Initialize the state of the system
-         self.state = State([i for i in range(self.num_components)])
+         self.state = State([i for i in range(self.num_components)], self.eras_code.new_decoder(self.num_components))
 
          # Likelihood ratio
-         self.lr = mpf(1)
+         self.reset_lr()
          
          self.inv_transform_variates = InverseTransformHomogeneousFailRepairRates(self.components)
+
+         # Skip-ahead sampler for the all-healthy state
+         self.first_failure = FirstFailureSampler(self.components)
      
     ##
     # Reset the simulator
@@ -29,50 +32,35 @@ class BFBOpt(Simulation):
           # Generate next failure event
          
           # Reset clocks and state
-          for component in self.components:
-                component.init_clock(0)
-                component.init_state()
+          self.component_table.reset(0)
           
           # Reset system state
-          self.state = State(self.components)
+          self.state.reset()
 
           # Reset LR
-          self.lr = mpf(1) 
+          self.reset_lr()
+
+          # Biased draws made (and how many were failures), for tuning fb_prob
+          self.num_fb_draws = 0
+          self.num_fb_fails = 0
 
     ##
     # Get the current event rate
     #
     def get_event_rate(self):
           
-        event_rate = mpf(0)
-       
-        for component in self.components:
-            event_rate += component.inst_rate_sum()
-
-        return event_rate
+        return self.component_table.total_fail_rate() + self.component_table.total_repair_rate()
     
     ##
     # Get repair rate
     #
     def get_repair_rate(self):
-        failed_components = self.state.get_failed_components()
-        repair_rate = 0
-        
-        for comp in failed_components:
-            repair_rate += self.components[comp].curr_component_repair_rate()
-        
-        return repair_rate
+        return self.component_table.total_repair_rate()
     ##
     # Get failure rate
     #
     def get_fail_rate(self):
-        avail_components = self.state.get_avail_components()
-        fail_rate = 0
-        
-        for comp in avail_components:
-            fail_rate += self.components[comp].curr_component_fail_rate()
-        
-        return fail_rate
+        return self.component_table.total_fail_rate()
     
     def get_time_to_repair(self):
         failed_components = self.state.get_failed_components()
@@ -103,24 +91,14 @@ class BFBOpt(Simulation):
          # If not in a failed state, then draw for next device failure
          if self.state.get_sys_state() == self.state.CURR_STATE_OK:
               avail_comps = self.state.get_avail_components()
-              next_event_comp = 0
-              clock_val = self.components[0].read_clock()
-              next_event_time = self.components[0].component_fail_distr.draw_inverse_transform(clock_val) + curr_time
-
-              for comp_idx in range(1, len(self.components)):
-                    clock_val = self.components[comp_idx].read_clock()
-                    event_time = self.components[comp_idx].component_fail_distr.draw_inverse_transform(clock_val) + curr_time
-                    
-                    if event_time < next_event_time:
-                         next_event_time = event_time
-                         next_event_comp = comp_idx
+              (wait_time, next_event_comp) = self.first_failure.draw(avail_comps)
+              next_event_time = wait_time + curr_time
                          
               # Update internal component state
               self.components[next_event_comp].fail_component(next_event_time)
               
               # Update all component clocks
-              for component in self.components:
-                  component.update_clock(next_event_time)
+              self.sim_clock.update(next_event_time)
               
               return (next_event_time, Component.EVENT_COMP_FAIL, next_event_comp)
                 
@@ -131,25 +109,23 @@ class BFBOpt(Simulation):
              draw = random.uniform()
 
              # Update all component clocks
-             for component in self.components:
-                 component.update_clock(next_event_time)
+             self.sim_clock.update(next_event_time)
                      
              event_rate = self.get_event_rate()
              
              fail_rate = self.bfb_fail_rate(event_rate)
+
+             self.num_fb_draws += 1
              
              # Failure
              if draw <= (fail_rate / event_rate):
-                 avail_comps = self.state.get_avail_components()
-                 comp_id = avail_comps[random.randint(0, len(avail_comps)-1)]
+                 self.num_fb_fails += 1
+                 num_avail = self.state.get_num_component_avail()
+                 comp_id = self.state.get_avail_component(random.randint(0, num_avail))
                  event_type = Component.EVENT_COMP_FAIL
-                 
-                 total_fail_rate = 0
-                 for component_id in self.state.get_avail_components():
-                     total_fail_rate += self.components[component_id].curr_component_fail_rate()
 
                  # Update the LR to deal with this
-                 self.lr *= (self.components[comp_id].curr_component_fail_rate()/event_rate) / (self.fb_prob/len(avail_comps))
+                 self.scale_lr((self.components[comp_id].curr_component_fail_rate()/event_rate) / (self.fb_prob/num_avail))
                  
                  # Update internal component state
                  self.components[comp_id].fail_component(next_event_time)
@@ -161,7 +137,7 @@ class BFBOpt(Simulation):
                  total_repair_rate = self.get_repair_rate()
                  repair_rates = []
                  
-                 repair_prob_sum = mpf(0)
+                 repair_prob_sum = arith.real(0)
                  for component_id in self.state.get_failed_components():
                      repair_prob_sum += (self.components[component_id].curr_component_repair_rate() / total_repair_rate)
 
@@ -170,7 +146,7 @@ class BFBOpt(Simulation):
                          break
                     
                  # Update the LR to deal with this
-                 self.lr *= (self.components[comp_id].curr_component_repair_rate()/event_rate)/((1-self.fb_prob) * (self.components[comp_id].curr_component_repair_rate()/total_repair_rate))
+                 self.scale_lr((self.components[comp_id].curr_component_repair_rate()/event_rate)/((1-self.fb_prob) * (self.components[comp_id].curr_component_repair_rate()/total_repair_rate)))
                   
                  
                  # Update internal component state
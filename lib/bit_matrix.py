@@ -1,28 +1,30 @@
 import math
 import random
 import sys
+import numpy
 from bm_ops import *
-from big_bm import *
 from util import *
 
+##
+# A GF(2) matrix whose rows are Python ints (bit j of a row is column
+# j), so that row operations work on whole machine words at a time.
+#
 class bit_matrix:
     def __init__(self, num_rows, num_cols):
         self.num_rows = num_rows
         self.num_cols = num_cols
-        self.matrix = []
-        for i in range(num_rows):
-            self.matrix.append(big_bm(num_cols)) 
+        self.col_mask = (1 << num_cols) - 1
+        self.matrix = [0 for i in range(num_rows)]
 
     def copy(self):
         obj = bit_matrix(self.num_rows, self.num_cols)
-        for i in range(obj.num_rows):
-            obj.matrix[i] = self.matrix[i].copy()
+        obj.matrix = self.matrix[:]
         return obj
 
     def __str__(self):
         str=""
         for row in self.matrix:
-            str+="%s, (%s)\n" % (row, row.get_weight())
+            str+="%s, (%s)\n" % (bin(row)[2:].zfill(self.num_cols), get_weight(row))
         return str
 
     def swap_rows(self, row1, row2):
@@ -31,65 +33,133 @@ class bit_matrix:
         self.matrix[row2] = tmp
 
     def set_row(self, row_idx, bit_idxs):
-        self.matrix[row_idx].set_bits(bit_idxs)
+        self.matrix[row_idx] |= list_to_bm(bit_idxs)
     
     def get_row(self, row_idx):
         return self.matrix[row_idx]
 
     def is_set(self, row_idx, bit_idx):
-        return self.matrix[row_idx].is_set(bit_idx)
+        return (self.matrix[row_idx] >> bit_idx) & 1
 
     def zero_cols(self, col_idxs):
-        mask = big_bm(self.num_cols)
-        mask.set_all_ones()
-        mask.unset_bits(col_idxs)
+        mask = self.col_mask & ~list_to_bm(col_idxs)
 
-        for i in range(self.num_rows):
-            self.matrix[i].band(self.matrix[i], mask)
+        self.matrix = [row & mask for row in self.matrix]
 
     def zero_rows(self, row_idxs):
         for row_idx in row_idxs:
-            self.matrix[row_idx].set_all_zeroes()
+            self.matrix[row_idx] = 0
 
     def randomize(self):
         for i in range(self.num_rows):
-            self.matrix[i].randomize()
+            self.matrix[i] = random.getrandbits(self.num_cols)
 
     def band_store(self, row1, row2):
-        self.matrix[row1].band(self.matrix[row1], self.matrix[row2])
+        self.matrix[row1] &= self.matrix[row2]
 
     def xor_store(self, row1, row2):
-        self.matrix[row1].xor(self.matrix[row1], self.matrix[row2])
-
+        self.matrix[row1] ^= self.matrix[row2]
+
+##
+# Number of set bits of a row
+#
+def get_weight(row):
+    return bin(row).count("1")
+
+##
+# Rank of matrix by Gaussian elimination on whole rows: each pivot row
+# is XORed into the remaining rows that have its leading bit set.  The
+# matrix is left unchanged.
+#
 def get_rank(matrix):
+    rows = [row for row in matrix.matrix if row != 0]
     rank = 0
-    curr_col =  matrix.num_cols-1
-    i=0
-
-    while i < matrix.num_rows and curr_col >= 0:
-        swap = False
-        for j in range(i, matrix.num_rows):
-            if matrix.matrix[j].is_set(curr_col) == 1:
-                swap = True
-                # Swap the rows                 
-                matrix.swap_rows(i, j)
-
-                rank+=1
-
-                break 
-
-        if swap is True:
-            for j in range(i, matrix.num_rows):
-                if j != i and matrix.matrix[j].is_set(curr_col) == 1:
-                    matrix.xor_store(j, i)
-                    
-        if swap is False:
-            curr_col-=1
-        else:
-            curr_col-=1
-            i += 1
+
+    while len(rows) > 0:
+        pivot = rows.pop()
+        rank += 1
+
+        lead = 1 << (pivot.bit_length()-1)
+        reduced = []
+        for row in rows:
+            if row & lead:
+                row ^= pivot
+                if row == 0:
+                    continue
+            reduced.append(row)
+        rows = reduced
+
     return rank
 
+##
+# Columns per word, and matrices per elimination pass, of the batched
+# rank evaluation
+#
+WORD_BITS = 64
+BATCH_SIZE = 4096
+
+##
+# Split a row (or column bitmap) into num_words words, lowest first
+#
+def to_words(row, num_words):
+    return [(row >> (WORD_BITS*i)) & ((1 << WORD_BITS) - 1) for i in range(num_words)]
+
+##
+# Ranks of matrix with each set of columns in erased_bms zeroed, the
+# same as get_rank() of a copy with zero_cols() applied, for each
+# bitmap in turn.  The masked matrices are eliminated together as
+# NumPy arrays, BATCH_SIZE at a time.
+#
+# @param erased_bms: sequence of bitmaps of the columns to zero
+# @return array of ranks
+#
+def get_ranks(matrix, erased_bms):
+    num_words = (matrix.num_cols + WORD_BITS - 1) // WORD_BITS
+    rows = numpy.array([to_words(row, num_words) for row in matrix.matrix], dtype=numpy.uint64)
+
+    ranks = numpy.zeros(len(erased_bms), dtype=int)
+    for start in range(0, len(erased_bms), BATCH_SIZE):
+        keep = numpy.array([to_words(matrix.col_mask & ~bm, num_words) for bm in erased_bms[start:start+BATCH_SIZE]],
+                           dtype=numpy.uint64).reshape(-1, num_words)
+        masked = rows[numpy.newaxis, :, :] & keep[:, numpy.newaxis, :]
+        ranks[start:start+len(keep)] = get_stacked_ranks(masked, matrix.num_cols)
+
+    return ranks
+
+##
+# Ranks of a stack of matrices by Gaussian elimination of all of them
+# at once, one column at a time.  In every matrix with a free row that
+# has the column set, the first such row becomes the pivot and is XORed
+# into the other free rows that have the column set.
+#
+# @param rows: uint64 array (matrices, rows, words), modified in place
+# @return array of ranks
+#
+def get_stacked_ranks(rows, num_cols):
+    (num_matrices, num_rows, num_words) = rows.shape
+    free = numpy.ones((num_matrices, num_rows), dtype=bool)
+    ranks = numpy.zeros(num_matrices, dtype=int)
+    one = numpy.uint64(1)
+
+    for col in range(num_cols):
+        bit = numpy.uint64(col % WORD_BITS)
+        has_col = (((rows[:, :, col // WORD_BITS] >> bit) & one) == one) & free
+
+        found = numpy.nonzero(has_col.any(1))[0]
+        if len(found) == 0:
+            continue
+
+        pivots = has_col[found].argmax(1)
+        pivot_rows = rows[found, pivots]
+        reduce = has_col[found]
+        reduce[numpy.arange(len(found)), pivots] = False
+
+        rows[found] ^= numpy.where(reduce[:, :, numpy.newaxis], pivot_rows[:, numpy.newaxis, :], numpy.uint64(0))
+        free[found, pivots] = False
+        ranks[found] += 1
+
+    return ranks
+
 # Make a systematic generator matrix  G=[I_num_data | P]
 def build_generator(num_data, num_parity, parity_eqns):
     generator_matrix = bit_matrix(num_data, num_parity+num_data)
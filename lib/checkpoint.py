@@ -0,0 +1,81 @@
+##
+# This module contains checkpoints for long simulation runs.
+#
+# A run made with parallel_sim is determined by its options, its master
+# seed and the number of blocks run: every block reseeds the random
+# streams from the master seed and the block number.  A checkpoint
+# therefore only holds the command line options, the seed, the next
+# block number, the number of iterations run and the merged block
+# result, and a run continued from it gives the same result as a run
+# that was never interrupted.
+#
+
+import os
+import time
+import cPickle
+
+##
+# Minimum number of seconds between two checkpoint writes
+#
+CHECKPOINT_INTERVAL = 300
+
+class Checkpoint:
+
+    ##
+    # @param args: the command line options of the run
+    #
+    def __init__(self, args=None):
+        self.args = args
+        self.seed = None
+        self.next_block = 0
+        self.iterations_run = 0
+        self.stats = None
+
+    ##
+    # Has any part of the run been done yet?
+    #
+    def is_started(self):
+        return self.stats is not None
+
+    def update(self, stats, next_block, iterations_run):
+        self.stats = stats
+        self.next_block = next_block
+        self.iterations_run = iterations_run
+
+    ##
+    # Write the checkpoint to path.  The file is replaced atomically, so
+    # a run killed while writing leaves the previous checkpoint intact.
+    #
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        f = open(tmp_path, "wb")
+        cPickle.dump(self, f, cPickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(tmp_path, path)
+
+def load_checkpoint(path):
+    f = open(path, "rb")
+    checkpoint = cPickle.load(f)
+    f.close()
+    return checkpoint
+
+##
+# Block callback for parallel_sim.run_blocks that keeps a checkpoint up
+# to date and writes it at most every interval seconds.
+#
+class CheckpointWriter:
+
+    def __init__(self, checkpoint, path, interval=CHECKPOINT_INTERVAL):
+        self.checkpoint = checkpoint
+        self.path = path
+        self.interval = interval
+        self.last_save = time.time()
+
+    def __call__(self, stats, next_block, iterations_run):
+        self.checkpoint.update(stats, next_block, iterations_run)
+        if time.time() - self.last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        self.checkpoint.save(self.path)
+        self.last_save = time.time()
@@ -0,0 +1,53 @@
+##
+# This module rewrites sections of the code description files read by
+# ErasureCode (see erasure_code.py).
+#
+# A section is a header line followed by one line, except for the
+# minimal fault sets, which run up to an [END] line.  The parser stops
+# at the first blank line, so none are written.
+#
+
+import os
+
+END_MARKER = "[END]"
+MULTI_LINE_SECTIONS = ["[minimal fault sets]"]
+
+##
+# Write the code file in_path to out_path with the given sections
+# replaced (or added at the end)
+#
+# @param sections: list of (header, list of lines)
+#
+def replace_sections(in_path, out_path, sections):
+    headers = [header for (header, lines) in sections]
+    lines = [line.rstrip("\n") for line in open(in_path, "r")]
+
+    kept = []
+    i = 0
+    while i < len(lines):
+        header = lines[i].strip()
+        if header not in headers:
+            kept.append(lines[i])
+            i += 1
+        elif header in MULTI_LINE_SECTIONS:
+            while i < len(lines) and lines[i].strip() != END_MARKER:
+                i += 1
+            i += 1
+        else:
+            i += 2
+    while len(kept) > 0 and kept[-1].strip() == "":
+        kept.pop()
+
+    for (header, section_lines) in sections:
+        kept.append(header)
+        kept.extend(section_lines)
+        if header in MULTI_LINE_SECTIONS:
+            kept.append(END_MARKER)
+
+    # Write to a temporary file first, so that a failed write does not
+    # leave a truncated code file
+    tmp_path = "%s.%d" % (out_path, os.getpid())
+    file = open(tmp_path, "w")
+    file.write("\n".join(kept) + "\n")
+    file.close()
+    os.rename(tmp_path, out_path)
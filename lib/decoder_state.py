@@ -0,0 +1,117 @@
+##
+# This module tracks whether an XOR code can still be decoded as disks
+# fail and are repaired one at a time.
+#
+# Data is lost when the generator matrix columns of the surviving
+# symbols span fewer than k dimensions.  The columns (as k-bit ints) of
+# the surviving symbols are kept reduced to a basis in echelon form,
+# keyed by leading bit, where every basis vector remembers which
+# symbols it is the sum of.  The surviving symbols that are not part of
+# the basis are kept as spares.
+#
+# Restoring a symbol inserts its column into the basis.  Erasing a
+# symbol that is part of the basis drops one of the basis vectors that
+# contain it, adds that vector to the others that contain it, and then
+# inserts the first spare that is independent of the remaining basis
+# (at most one is needed to get back to the span of the surviving
+# symbols).  Each update costs a few reductions of a k-bit int by the
+# basis, instead of an elimination of the whole masked matrix.
+#
+
+import copy
+
+class DecoderState:
+
+    ##
+    # @param columns: generator matrix column of each symbol, as a k-bit int
+    # @param disk_symbols: list of the symbols stored on each disk
+    # @param k: number of data symbols
+    #
+    def __init__(self, columns, disk_symbols, k):
+        self.columns = columns
+        self.disk_symbols = disk_symbols
+        self.k = k
+
+        # basis[leading bit] = (vector, bitmap of the symbols it sums)
+        self.basis = {}
+        self.spares = []
+        for symbol in range(len(columns)):
+            self.restore_symbol(symbol)
+
+        # All symbols available, the state reset() goes back to
+        self.initial_basis = dict(self.basis)
+        self.initial_spares = self.spares[:]
+
+    ##
+    # Go back to all symbols available
+    #
+    def reset(self):
+        self.basis = dict(self.initial_basis)
+        self.spares = self.initial_spares[:]
+
+    def copy(self):
+        obj = copy.copy(self)
+        obj.basis = dict(self.basis)
+        obj.spares = self.spares[:]
+        return obj
+
+    ##
+    # Reduce vector by the basis and add it if it is independent
+    #
+    # @return True if vector was added to the basis
+    #
+    def insert(self, vector, symbols):
+        while vector != 0:
+            lead = vector.bit_length() - 1
+            if not self.basis.has_key(lead):
+                self.basis[lead] = (vector, symbols)
+                return True
+            (basis_vector, basis_symbols) = self.basis[lead]
+            vector ^= basis_vector
+            symbols ^= basis_symbols
+        return False
+
+    def restore_symbol(self, symbol):
+        if not self.insert(self.columns[symbol], 1 << symbol):
+            self.spares.append(symbol)
+
+    def erase_symbol(self, symbol):
+        if symbol in self.spares:
+            self.spares.remove(symbol)
+            return
+
+        holders = [lead for (lead, (vector, symbols)) in self.basis.items() if (symbols >> symbol) & 1]
+        (pivot, pivot_symbols) = self.basis.pop(holders[0])
+        for lead in holders[1:]:
+            (vector, symbols) = self.basis.pop(lead)
+            self.insert(vector ^ pivot, symbols ^ pivot_symbols)
+
+        for i in range(len(self.spares)):
+            spare = self.spares[i]
+            if self.insert(self.columns[spare], 1 << spare):
+                del self.spares[i]
+                break
+
+    def fail_disk(self, disk):
+        for symbol in self.disk_symbols[disk]:
+            self.erase_symbol(symbol)
+
+    def repair_disk(self, disk):
+        for symbol in self.disk_symbols[disk]:
+            self.restore_symbol(symbol)
+
+    ##
+    # @return True if the failed disks lose data
+    #
+    def is_failure(self):
+        return len(self.basis) < self.k
+
+    ##
+    # Whether erasing symbols too (e.g. symbols lost to sector failures
+    # in one stripe) loses data.  The state is left unchanged.
+    #
+    def is_failure_with(self, symbols):
+        decoder = self.copy()
+        for symbol in symbols:
+            decoder.erase_symbol(symbol)
+        return decoder.is_failure()
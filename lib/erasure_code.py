@@ -1,6 +1,12 @@
 from bit_matrix import *
 from numpy import random
+import numpy
 from util import kset_set
+from collections import OrderedDict
+from decoder_state import DecoderState
+from mel_index import MinimalErasureIndex
+from failure_table import MAX_TABLE_SYMBOLS, TABLE_SUFFIX, load_failure_table, \
+	build_from_minimal_sets, build_from_check
 
 ##
 # This module encapsulates information and functions for 
@@ -15,6 +21,11 @@ from util import kset_set
 #
 code_dir="./codes/"
 
+##
+# Default number of entries of the failure check cache (see is_failure)
+#
+DEFAULT_CHECK_CACHE_SIZE = 4096
+
 ##
 # This class encapsulates the number of data/parity symbols,
 # the code type, the tanner graph (for XOR-based codes) and 
@@ -29,7 +40,11 @@ class ErasureCode:
 	CHECK_FTV = "ftv_check"
 	CHECK_DSCFT = "disk sector conditional fault tolerance check"
 
-	def __init__(self, code_file, fail_check_type=None):
+	# Failure table file suffixes of the deterministic checks
+	TABLE_SUFFIXES = {CHECK_RANK: ".rank" + TABLE_SUFFIX, CHECK_MEL: ".mel" + TABLE_SUFFIX}
+
+	def __init__(self, code_file, fail_check_type=None, check_cache_size=DEFAULT_CHECK_CACHE_SIZE,
+		     use_failure_table=True):
 		file = open(code_dir+code_file, "r")
 		
 		if fail_check_type is None:
@@ -37,6 +52,13 @@ class ErasureCode:
 		else:
 			self.fail_check_type = fail_check_type
 		
+		# LRU cache of the deterministic (rank and MEL) checks:
+		# (failed disk bitmap, stripe sector bitmap) -> failure
+		self.check_cache_size = check_cache_size
+		self.check_cache = OrderedDict()
+		self.check_cache_hits = 0
+		self.check_cache_misses = 0
+
 		self.hd = None
 
 		line = file.readline().strip()
@@ -87,6 +109,21 @@ class ErasureCode:
 		if self.hd is None:
 			self.hd = 2
 
+		# Superset index of the minimal erasures for the MEL check
+		self.mel_index = None
+		if self.fail_check_type == self.CHECK_MEL:
+			self.mel_index = MinimalErasureIndex(self.mel_bm)
+
+		# Deterministic checks of small XOR codes are looked up in a
+		# table of all erasure patterns (see failure_table.py)
+		self.failure_table = None
+		if use_failure_table is True and self.type != self.TYPE_MDS and \
+				self.TABLE_SUFFIXES.has_key(self.fail_check_type) and \
+				self.k + self.m <= MAX_TABLE_SYMBOLS:
+			self.failure_table = load_failure_table(code_dir + code_file + self.TABLE_SUFFIXES[self.fail_check_type],
+								code_dir + code_file, self.k + self.m,
+								self.build_failure_table)
+
 	##
 	# Determine if this set of failed symbols results in a failure.
 	#
@@ -95,12 +132,16 @@ class ErasureCode:
 	#
 	# For XOR-based codes, we must resort to either a lookup to the 
 	# minimal erasures list or perform a rank test on a modified 
-	# generator matrix.
+	# generator matrix.  Both are deterministic: for small codes they
+	# are looked up in the failure table, otherwise their result for
+	# each stripe is cached (see is_stripe_failure).
 	#
 	# @param failed_symbols: list of failed symbol ids
+	# @param decoder: DecoderState (see new_decoder) tracking failed_disks;
+	#                 the rank check is then done on it
 	# @return True if no failure or False if there is a failure 
 	#
-	def is_failure(self, failed_disks, failed_sectors=[]):
+	def is_failure(self, failed_disks, failed_sectors=[], decoder=None):
 		symbol_errors = []
 		unique_sectors = {}
 		
@@ -132,7 +173,7 @@ class ErasureCode:
 					if not unique_sectors.has_key(stripe_num):
 						unique_sectors[stripe_num] = []
 
-					unique_sectors[stripe_num].append(self.layout[i][sector % len(self.layout[i])])
+					unique_sectors[stripe_num].append(self.layout[comp][sector % len(self.layout[comp])])
 		
 		# Determine if there is a failure	
 		if self.type == self.TYPE_MDS:
@@ -141,31 +182,26 @@ class ErasureCode:
 					return True
 			return False
 		
-		if self.fail_check_type == self.CHECK_RANK:
-			
+		if decoder is not None:
 			for sectors in unique_sectors.values():
-			
-				temp_matrix = self.generator_matrix.copy()
-			
-				temp_matrix.zero_cols(symbol_errors + sectors)
-			
-				if self.k > get_rank(temp_matrix):
+				if decoder.is_failure_with(sectors) is True:
 					return True
-				else:
-					return False
-			
-		elif self.fail_check_type == self.CHECK_MEL:
+			return False
+
+		if self.failure_table is not None:
 			for sectors in unique_sectors.values():
-				
-				symbol_errors_bm = list_to_bm(symbol_errors+sectors)
-			
-				for me_pattern in self.mel_bm:
-					if bm_intersection(symbol_errors_bm, me_pattern) == me_pattern:
-						return True
-					
+				if self.failure_table.is_failure(list_to_bm(symbol_errors + sectors)) is True:
+					return True
 			return False
-		
-		elif self.fail_check_type == self.CHECK_FTV:
+
+		if self.fail_check_type == self.CHECK_RANK or self.fail_check_type == self.CHECK_MEL:
+			failed_disks_bm = list_to_bm(failed_disks)
+			for sectors in unique_sectors.values():
+				if self.is_stripe_failure(failed_disks_bm, symbol_errors, sectors) is True:
+					return True
+			return False
+
+		if self.fail_check_type == self.CHECK_FTV:
 			
 			for sectors in unique_sectors.values():
 			
@@ -192,8 +228,146 @@ class ErasureCode:
 				if draw < self.dsft[len(failed_disks)][len(sectors)]:
 					return True
 			return False
-		
-					
+
+	##
+	# Deterministic check of one stripe, cached by the failed disks and
+	# the stripe's sector erasures (the symbol errors follow from them).
+	# The least recently used entry is dropped when the cache is full.
+	#
+	# @param failed_disks_bm: bitmap of the failed disks
+	# @param symbol_errors: list of symbols lost with the failed disks
+	# @param sectors: list of symbols lost to sector failures in the stripe
+	# @return True if the stripe cannot be decoded
+	#
+	def is_stripe_failure(self, failed_disks_bm, symbol_errors, sectors):
+		key = (failed_disks_bm, list_to_bm(sectors))
+
+		failure = self.check_cache.pop(key, None)
+		if failure is not None:
+			self.check_cache_hits += 1
+			self.check_cache[key] = failure
+			return failure
+
+		self.check_cache_misses += 1
+		failure = self.check_erasures(symbol_errors + sectors)
+
+		if self.check_cache_size > 0:
+			if len(self.check_cache) >= self.check_cache_size:
+				self.check_cache.popitem(last=False)
+			self.check_cache[key] = failure
+
+		return failure
+
+	##
+	# Rank or MEL check of a set of erased symbols
+	#
+	# @return True if the erased symbols cannot be recovered
+	#
+	def check_erasures(self, erased_symbols):
+		if self.fail_check_type == self.CHECK_RANK:
+			temp_matrix = self.generator_matrix.copy()
+			temp_matrix.zero_cols(erased_symbols)
+
+			return self.k > get_rank(temp_matrix)
+
+		return self.mel_index.contains_subset_of(list_to_bm(erased_symbols))
+
+	##
+	# Rank or MEL check of many sets of erased symbols at once (the rank
+	# check eliminates all the masked generator matrices together)
+	#
+	# @param erased_bms: sequence of bitmaps of the erased symbols
+	# @return boolean array, True where the symbols cannot be recovered
+	#
+	def check_erasures_batch(self, erased_bms):
+		if self.fail_check_type == self.CHECK_RANK:
+			return get_ranks(self.generator_matrix, erased_bms) < self.k
+
+		return numpy.array([self.check_erasures(bm_to_list(bm)) for bm in erased_bms], dtype=bool)
+
+	##
+	# Deterministic check of many sets of erased symbols at once: a
+	# count for MDS codes, the failure table or the batched rank or MEL
+	# check for XOR codes
+	#
+	# @param symbols_bms: sequence of bitmaps of the erased symbols
+	# @return boolean array, True where the symbols cannot be recovered
+	#
+	def are_symbol_failures(self, symbols_bms):
+		if self.type == self.TYPE_MDS:
+			return numpy.array([bin(bm).count("1") > self.m for bm in symbols_bms], dtype=bool)
+
+		if self.failure_table is not None:
+			return self.failure_table.are_failures(symbols_bms)
+
+		return self.check_erasures_batch(symbols_bms)
+
+	##
+	# is_failure() of many sets of failed disks (without sector
+	# failures) at once
+	#
+	# @param failed_disks_bms: sequence of bitmaps of the failed disks
+	# @return boolean array, True where the failed disks lose data
+	#
+	def are_failures(self, failed_disks_bms):
+		if self.type != self.TYPE_MDS and self.fail_check_type != self.CHECK_RANK and \
+				self.fail_check_type != self.CHECK_MEL:
+			return numpy.array([self.is_failure(bm_to_list(bm)) is True for bm in failed_disks_bms], dtype=bool)
+
+		symbols_bms = failed_disks_bms
+		if self.type == self.TYPE_ARRAY_XOR:
+			disk_symbols = [list_to_bm(symbols) for symbols in self.layout]
+			symbols_bms = []
+			for bm in failed_disks_bms:
+				symbols_bm = 0
+				for disk in bm_to_list(bm):
+					symbols_bm |= disk_symbols[disk]
+				symbols_bms.append(symbols_bm)
+
+		return self.are_symbol_failures(symbols_bms)
+
+	##
+	# Symbols stored on each disk
+	#
+	def get_disk_symbols(self):
+		if self.type == self.TYPE_ARRAY_XOR:
+			return self.layout
+		return [[symbol] for symbol in range(self.k + self.m)]
+
+	##
+	# Decoder state to track whole-disk failures incrementally (see
+	# decoder_state.py), for XOR codes with the rank check and no
+	# failure table
+	#
+	# @param num_disks: number of disks of the system
+	# @return a DecoderState, or None if the check is not tracked
+	#
+	def new_decoder(self, num_disks):
+		if self.type == self.TYPE_MDS or self.fail_check_type != self.CHECK_RANK or \
+				self.failure_table is not None:
+			return None
+
+		num_symbols = self.k + self.m
+		columns = [0 for i in range(num_symbols)]
+		for i in range(self.k):
+			for symbol in bm_to_list(self.generator_matrix.get_row(i)):
+				columns[symbol] |= 1 << i
+
+		disk_symbols = self.get_disk_symbols()
+		if len(disk_symbols) != num_disks:
+			return None
+
+		return DecoderState(columns, disk_symbols, self.k)
+
+	##
+	# Build the failure table bitset with the current check
+	#
+	def build_failure_table(self):
+		if self.fail_check_type == self.CHECK_MEL:
+			return build_from_minimal_sets(self.k + self.m, self.mel_bm)
+
+		return build_from_check(self.k + self.m, self.m, self.check_erasures_batch)
+
 def test():
 	ec = ErasureCode("5_3_flat", ErasureCode.CHECK_FTV)
 
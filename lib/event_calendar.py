@@ -0,0 +1,172 @@
+##
+# This module contains an event calendar for the discrete-event
+# simulators: an indexed binary min-heap holding at most one pending
+# event time per component.
+#
+# Scheduling, rescheduling and cancelling an event are O(log n),
+# finding the earliest event is O(1).
+#
+
+class EventCalendar:
+
+    ##
+    # Construct an empty calendar for components 0 .. num_components-1
+    #
+    def __init__(self, num_components):
+        self.num_components = num_components
+
+        # Heap of component ids, ordered by (event time, component id)
+        self.heap = []
+
+        # Pending event time of each component
+        self.time = [None for i in range(num_components)]
+
+        # Position of each component in the heap (-1 if not scheduled)
+        self.pos = [-1 for i in range(num_components)]
+
+    ##
+    # Remove all pending events
+    #
+    def clear(self):
+        for comp in self.heap:
+            self.time[comp] = None
+            self.pos[comp] = -1
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    ##
+    # Is there a pending event for comp?
+    #
+    def is_scheduled(self, comp):
+        return self.pos[comp] != -1
+
+    ##
+    # Get the pending event time of comp (None if not scheduled)
+    #
+    def get_time(self, comp):
+        return self.time[comp]
+
+    ##
+    # Get the earliest event
+    #
+    # @return (event time, component id) or (None, None) if empty
+    #
+    def peek(self):
+        if len(self.heap) == 0:
+            return (None, None)
+        comp = self.heap[0]
+        return (self.time[comp], comp)
+
+    ##
+    # Remove and return the earliest event
+    #
+    def pop(self):
+        (time, comp) = self.peek()
+        if comp is not None:
+            self.cancel(comp)
+        return (time, comp)
+
+    ##
+    # Schedule (or reschedule) the event of comp at time
+    #
+    def schedule(self, comp, time):
+        if self.pos[comp] == -1:
+            self.time[comp] = time
+            self.pos[comp] = len(self.heap)
+            self.heap.append(comp)
+            self.sift_up(self.pos[comp])
+        else:
+            old_time = self.time[comp]
+            self.time[comp] = time
+            if time < old_time:
+                self.sift_up(self.pos[comp])
+            else:
+                self.sift_down(self.pos[comp])
+
+    ##
+    # Cancel the pending event of comp (if any)
+    #
+    def cancel(self, comp):
+        idx = self.pos[comp]
+        if idx == -1:
+            return
+
+        last = self.heap.pop()
+        self.pos[comp] = -1
+        self.time[comp] = None
+
+        if last != comp:
+            self.heap[idx] = last
+            self.pos[last] = idx
+            self.sift_up(idx)
+            self.sift_down(self.pos[last])
+
+    def less(self, comp1, comp2):
+        if self.time[comp1] != self.time[comp2]:
+            return self.time[comp1] < self.time[comp2]
+        return comp1 < comp2
+
+    def swap(self, idx1, idx2):
+        comp1 = self.heap[idx1]
+        comp2 = self.heap[idx2]
+        self.heap[idx1] = comp2
+        self.heap[idx2] = comp1
+        self.pos[comp2] = idx1
+        self.pos[comp1] = idx2
+
+    def sift_up(self, idx):
+        while idx > 0:
+            parent = (idx - 1) >> 1
+            if not self.less(self.heap[idx], self.heap[parent]):
+                break
+            self.swap(idx, parent)
+            idx = parent
+
+    def sift_down(self, idx):
+        size = len(self.heap)
+        while 1:
+            smallest = idx
+            left = 2*idx + 1
+            right = left + 1
+            if left < size and self.less(self.heap[left], self.heap[smallest]):
+                smallest = left
+            if right < size and self.less(self.heap[right], self.heap[smallest]):
+                smallest = right
+            if smallest == idx:
+                break
+            self.swap(idx, smallest)
+            idx = smallest
+
+def test():
+    import random
+
+    num_components = 64
+    calendar = EventCalendar(num_components)
+    pending = {}
+
+    for i in range(10000):
+        comp = random.randint(0, num_components-1)
+        if random.random() < 0.3:
+            calendar.cancel(comp)
+            if pending.has_key(comp):
+                del pending[comp]
+        else:
+            time = random.random()
+            calendar.schedule(comp, time)
+            pending[comp] = time
+
+        if len(pending) == 0:
+            expected = (None, None)
+        else:
+            expected = min([(t, c) for (c, t) in pending.items()])
+
+        if calendar.peek() != expected:
+            print "Failed test"
+            return
+
+    print "Passed test"
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,149 @@
+##
+# This module contains lookup tables of the unrecoverable erasure
+# patterns of a code.
+#
+# For a code of n symbols the table is a packed bitset over all 2^n
+# erasure patterns, indexed by the bitmap of the erased symbols: bit s
+# of the table (most significant bit first within each byte) is set if
+# pattern s cannot be decoded.  Tables are saved next to the code file
+# and memory-mapped when loaded, so that worker processes share one
+# copy of the pages.  A saved table is rebuilt if it is older than its
+# code file.
+#
+
+import os
+import itertools
+import numpy
+
+##
+# Largest number of symbols a table is built for (2^24 patterns take
+# 2 MB)
+#
+MAX_TABLE_SYMBOLS = 24
+
+##
+# Suffix of the table files
+#
+TABLE_SUFFIX = ".ftab"
+
+class FailureTable:
+
+    ##
+    # @param bits: packed bitset (uint8 array or memmap) over all
+    #              erasure patterns
+    #
+    def __init__(self, bits):
+        self.bits = bits
+
+    ##
+    # @param erased_bm: bitmap of the erased symbols
+    # @return True if the erased symbols cannot be recovered
+    #
+    def is_failure(self, erased_bm):
+        return bool((self.bits[erased_bm >> 3] >> (7 - (erased_bm & 7))) & 1)
+
+    ##
+    # is_failure() of many patterns with one array lookup
+    #
+    # @param erased_bms: sequence of bitmaps of the erased symbols
+    # @return boolean array, True where the symbols cannot be recovered
+    #
+    def are_failures(self, erased_bms):
+        erased = numpy.array(erased_bms, dtype=numpy.int64)
+        return ((self.bits[erased >> 3] >> (7 - (erased & 7))) & 1).astype(bool)
+
+##
+# Size in bytes of the table of a code of num_symbols symbols
+#
+def table_size(num_symbols):
+    return ((1 << num_symbols) + 7) >> 3
+
+##
+# Set the flag of every superset of a flagged pattern.  flags is a
+# boolean array over all 2^num_symbols patterns.
+#
+def close_supersets(flags, num_symbols):
+    for i in range(num_symbols):
+        view = flags.reshape(-1, 2, 1 << i)
+        view[:, 1, :] |= view[:, 0, :]
+
+##
+# Pack a boolean array over all patterns into a table bitset
+#
+def pack_flags(flags):
+    if len(flags) % 8 != 0:
+        flags = numpy.concatenate((flags, numpy.zeros(8 - len(flags) % 8, dtype=bool)))
+    return numpy.packbits(flags)
+
+##
+# Build the bitset from the minimal erasure patterns (as bitmaps): a
+# pattern is unrecoverable if it contains one of them.
+#
+def build_from_minimal_sets(num_symbols, minimal_sets):
+    flags = numpy.zeros(1 << num_symbols, dtype=bool)
+    for pattern in minimal_sets:
+        flags[pattern] = True
+
+    close_supersets(flags, num_symbols)
+
+    return pack_flags(flags)
+
+##
+# Build the bitset with a batched check function, check(sequence of
+# erasure bitmaps) returning a boolean array that is True where they
+# cannot be recovered.  Only patterns of up to max_erasures symbols are
+# checked (larger ones always fail), by increasing weight, and supersets
+# of a failed pattern are not checked.
+#
+def build_from_check(num_symbols, max_erasures, check):
+    patterns = numpy.arange(1 << num_symbols, dtype=numpy.uint32)
+    weights = numpy.zeros(1 << num_symbols, dtype=numpy.uint8)
+    for i in range(num_symbols):
+        weights += ((patterns >> i) & 1).astype(numpy.uint8)
+    flags = weights > max_erasures
+    del patterns, weights
+
+    for weight in range(1, max_erasures+1):
+        unknown = []
+        for symbols in itertools.combinations(range(num_symbols), weight):
+            pattern = 0
+            for symbol in symbols:
+                pattern |= 1 << symbol
+            if not flags[pattern]:
+                unknown.append(pattern)
+
+        if len(unknown) > 0:
+            failed = numpy.asarray(check(unknown), dtype=bool)
+            flags[numpy.array(unknown)[failed]] = True
+        close_supersets(flags, num_symbols)
+
+    return pack_flags(flags)
+
+##
+# Load the table saved in path, or build it with build() (returning the
+# bitset) and save it there.  If the table cannot be saved, the built
+# table is kept in memory only.
+#
+# @param source_path: the code file the table is derived from
+#
+def load_failure_table(path, source_path, num_symbols, build):
+    size = table_size(num_symbols)
+
+    if os.path.exists(path) and os.path.getsize(path) == size and \
+            os.path.getmtime(path) >= os.path.getmtime(source_path):
+        return FailureTable(numpy.memmap(path, dtype=numpy.uint8, mode="r"))
+
+    bits = build()
+
+    # Write to a temporary file first, so that concurrent runs never
+    # map a partly written table
+    tmp_path = "%s.%d" % (path, os.getpid())
+    try:
+        bits.tofile(tmp_path)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return FailureTable(bits)
+
+    return FailureTable(numpy.memmap(path, dtype=numpy.uint8, mode="r"))
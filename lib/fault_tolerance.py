@@ -0,0 +1,313 @@
+##
+# This module computes the fault tolerance tables of a code, read by
+# the FTV and DSCFT failure checks of ErasureCode, from its rank or MEL
+# check.
+#
+# ftv[i] is the probability that i+1 erased symbols, picked uniformly
+# at random, cannot be recovered.
+#
+# dscft[d][0] is the probability that d failed disks, picked uniformly
+# at random, lose data.  dscft[d][s] (s > 0) is the probability that
+# sector erasures on s other disks (one symbol of each) then lose data,
+# given that the d failed disks alone do not.  There is a row for every
+# number of failed disks that can be survived.
+#
+# An entry is counted over all of its patterns if there are at most
+# max_patterns of them.  Otherwise it is estimated from num_samples
+# random patterns, with a Wilson score confidence interval.  Entries are
+# computed in parallel, one per task.  Every task draws from its own
+# random stream, so the results do not depend on the number of workers.
+#
+
+import math
+import itertools
+import numpy
+from multiprocessing import Pool
+from bm_ops import list_to_bm
+from erasure_code import ErasureCode
+from code_file import replace_sections
+
+DEFAULT_MAX_PATTERNS = 100000
+DEFAULT_SAMPLES = 20000
+
+##
+# z value of the confidence intervals (95%)
+#
+CONFIDENCE_Z = 1.96
+
+##
+# Patterns checked per call of the code's batched check
+#
+CHUNK_SIZE = 4096
+
+##
+# Sampling gives up on a row of the DSCFT if fewer than one in this
+# many failed disk patterns survive
+#
+MAX_REJECTIONS = 100
+
+FTV_SECTION = "[fault tolerance vector]"
+DSCFT_SECTION = "[Disk sector conditional fault tolerance]"
+
+FTV_TASK = 0
+DSCFT_TASK = 1
+
+##
+# A table entry: probability, confidence interval, and whether it was
+# counted over all patterns
+#
+class Entry:
+    def __init__(self, failures, trials, exact):
+        self.failures = failures
+        self.trials = trials
+        self.exact = exact
+
+        if trials == 0:
+            # No pattern to condition on: the entry is never used
+            self.prob = 1.0
+            (self.low, self.high) = (1.0, 1.0)
+        else:
+            self.prob = float(failures) / trials
+            if exact is True:
+                (self.low, self.high) = (self.prob, self.prob)
+            else:
+                (self.low, self.high) = wilson_interval(failures, trials)
+
+    def __str__(self):
+        if self.exact is True:
+            return "%.6g (exact)" % self.prob
+        return "%.6g [%.6g, %.6g] (%d samples)" % (self.prob, self.low, self.high, self.trials)
+
+##
+# Wilson score interval of a binomial proportion
+#
+def wilson_interval(failures, trials, z=CONFIDENCE_Z):
+    p = float(failures) / trials
+    denom = 1 + z*z / trials
+    center = (p + z*z / (2*trials)) / denom
+    half_width = z * math.sqrt(p*(1-p) / trials + z*z / (4*trials*trials)) / denom
+    return (max(0.0, center - half_width), min(1.0, center + half_width))
+
+def num_combinations(n, r):
+    if r < 0 or r > n:
+        return 0
+    count = 1
+    for i in range(r):
+        count = count * (n - i) / (i + 1)
+    return count
+
+##
+# Per-process code used by the pool workers
+#
+worker_code = None
+
+def init_worker(code_file, fail_check_type):
+    global worker_code
+    worker_code = ErasureCode(code_file, fail_check_type)
+
+##
+# Count the unrecoverable patterns among symbol bitmaps, CHUNK_SIZE at
+# a time (bitmaps may be any iterable)
+#
+def count_failures(code, symbols_bms):
+    failures = 0
+    trials = 0
+    chunk = []
+    for bm in itertools.chain(symbols_bms, [None]):
+        if bm is not None:
+            chunk.append(bm)
+            if len(chunk) < CHUNK_SIZE:
+                continue
+        if len(chunk) > 0:
+            failures += int(code.are_symbol_failures(chunk).sum())
+            trials += len(chunk)
+            chunk = []
+    return (failures, trials)
+
+##
+# num_subsets random subsets of size r of items (as lists)
+#
+def random_subsets(rng, items, r, num_subsets):
+    picks = rng.random_sample((num_subsets, len(items))).argsort(1)[:, :r]
+    return [[items[i] for i in pick] for pick in picks.tolist()]
+
+def union(disk_bms, disks):
+    bm = 0
+    for disk in disks:
+        bm |= disk_bms[disk]
+    return bm
+
+##
+# ftv entry of num_erased erased symbols
+#
+def ftv_entry(code, rng, num_erased, max_patterns, num_samples):
+    num_symbols = code.k + code.m
+    symbols = range(num_symbols)
+
+    if num_combinations(num_symbols, num_erased) <= max_patterns:
+        patterns = (list_to_bm(erased) for erased in itertools.combinations(symbols, num_erased))
+        exact = True
+    else:
+        patterns = [list_to_bm(erased) for erased in random_subsets(rng, symbols, num_erased, num_samples)]
+        exact = False
+
+    (failures, trials) = count_failures(code, patterns)
+    return Entry(failures, trials, exact)
+
+##
+# Failed disk patterns of num_failed disks that are recoverable, all of
+# them or (if there are more than max_patterns) about num_samples
+# random ones
+#
+# @return (list of surviving patterns as disk lists, exact)
+#
+def surviving_disk_patterns(code, rng, num_failed, max_patterns, num_samples):
+    disk_bms = [list_to_bm(symbols) for symbols in code.get_disk_symbols()]
+    disks = range(len(disk_bms))
+
+    if num_combinations(len(disks), num_failed) <= max_patterns:
+        candidates = [list(failed) for failed in itertools.combinations(disks, num_failed)]
+        exact = True
+    else:
+        candidates = random_subsets(rng, disks, num_failed, num_samples)
+        exact = False
+
+    survivors = []
+    for start in range(0, len(candidates), CHUNK_SIZE):
+        chunk = candidates[start:start+CHUNK_SIZE]
+        lost = code.are_symbol_failures([union(disk_bms, failed) for failed in chunk])
+        survivors.extend([chunk[i] for i in range(len(chunk)) if not lost[i]])
+
+    return (survivors, exact)
+
+##
+# dscft entry of num_failed failed disks and sector erasures on
+# num_sectors other disks
+#
+def dscft_entry(code, rng, num_failed, num_sectors, max_patterns, num_samples):
+    disk_symbols = code.get_disk_symbols()
+    disk_bms = [list_to_bm(symbols) for symbols in disk_symbols]
+    num_disks = len(disk_bms)
+
+    if num_sectors == 0:
+        if num_combinations(num_disks, num_failed) <= max_patterns:
+            patterns = (union(disk_bms, failed) for failed in itertools.combinations(range(num_disks), num_failed))
+            exact = True
+        else:
+            patterns = [union(disk_bms, failed) for failed in random_subsets(rng, range(num_disks), num_failed, num_samples)]
+            exact = False
+
+        (failures, trials) = count_failures(code, patterns)
+        return Entry(failures, trials, exact)
+
+    # Sector patterns per surviving failed disk pattern, for exact counting
+    sector_disk_choices = num_combinations(num_disks - num_failed, num_sectors)
+    max_choices = 1
+    for symbols in disk_symbols:
+        max_choices = max(max_choices, len(symbols))
+    sector_patterns = sector_disk_choices * max_choices**num_sectors
+
+    if num_combinations(num_disks, num_failed) * sector_patterns <= max_patterns:
+        (survivors, exact) = surviving_disk_patterns(code, rng, num_failed, max_patterns, 0)
+
+        def patterns():
+            for failed in survivors:
+                failed_bm = union(disk_bms, failed)
+                others = [disk for disk in range(num_disks) if disk not in failed]
+                for sector_disks in itertools.combinations(others, num_sectors):
+                    for symbols in itertools.product(*[disk_symbols[disk] for disk in sector_disks]):
+                        yield failed_bm | list_to_bm(symbols)
+
+        (failures, trials) = count_failures(code, patterns())
+        return Entry(failures, trials, True)
+
+    # Sample surviving failed disk patterns, then the sector erasures
+    survivors = []
+    tries = 0
+    while len(survivors) < num_samples and tries < MAX_REJECTIONS * num_samples:
+        survivors.extend(surviving_disk_patterns(code, rng, num_failed, 0, num_samples)[0])
+        tries += num_samples
+    survivors = survivors[:num_samples]
+
+    patterns = []
+    for failed in survivors:
+        others = [disk for disk in range(num_disks) if disk not in failed]
+        sector_disks = random_subsets(rng, others, num_sectors, 1)[0]
+        symbols = [disk_symbols[disk][rng.randint(len(disk_symbols[disk]))] for disk in sector_disks]
+        patterns.append(union(disk_bms, failed) | list_to_bm(symbols))
+
+    (failures, trials) = count_failures(code, patterns)
+    return Entry(failures, trials, False)
+
+##
+# Compute one entry with the worker's code
+#
+# @param task: (task type, index, sectors, seed, max_patterns, num_samples)
+#
+def run_task(task):
+    (task_type, index, num_sectors, seed, max_patterns, num_samples) = task
+    rng = numpy.random.RandomState([seed, task_type, index, num_sectors])
+
+    if task_type == FTV_TASK:
+        return ftv_entry(worker_code, rng, index, max_patterns, num_samples)
+    return dscft_entry(worker_code, rng, index, num_sectors, max_patterns, num_samples)
+
+def run_tasks(pool, tasks):
+    if pool is None:
+        return [run_task(task) for task in tasks]
+    return pool.map(run_task, tasks, 1)
+
+##
+# Compute the tables of a code
+#
+# @param fail_check_type: ErasureCode.CHECK_RANK or ErasureCode.CHECK_MEL
+# @return (ftv, dscft) as lists (of lists) of Entry
+#
+def compute_tables(code_file, fail_check_type=ErasureCode.CHECK_RANK, workers=1, seed=0,
+                   max_patterns=DEFAULT_MAX_PATTERNS, num_samples=DEFAULT_SAMPLES):
+    # Built here first, so that a failure table is saved once and
+    # shared by the workers
+    code = ErasureCode(code_file, fail_check_type)
+    num_symbols = code.k + code.m
+    num_disks = len(code.get_disk_symbols())
+
+    init_worker(code_file, fail_check_type)
+    pool = None
+    if workers > 1:
+        pool = Pool(workers, init_worker, (code_file, fail_check_type))
+
+    try:
+        ftv_tasks = [(FTV_TASK, i, 0, seed, max_patterns, num_samples) for i in range(1, num_symbols+1)]
+        disk_tasks = [(DSCFT_TASK, d, 0, seed, max_patterns, num_samples) for d in range(num_disks+1)]
+        entries = run_tasks(pool, ftv_tasks + disk_tasks)
+        ftv = entries[:len(ftv_tasks)]
+        disk_entries = entries[len(ftv_tasks):]
+
+        # Rows up to the last number of failed disks that can be survived
+        num_rows = 0
+        for d in range(len(disk_entries)):
+            if disk_entries[d].failures < disk_entries[d].trials:
+                num_rows = d + 1
+
+        sector_tasks = [(DSCFT_TASK, d, s, seed, max_patterns, num_samples)
+                        for d in range(num_rows) for s in range(1, num_disks-d+1)]
+        sector_entries = run_tasks(pool, sector_tasks)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    dscft = [[disk_entries[d]] for d in range(num_rows)]
+    for (task, entry) in zip(sector_tasks, sector_entries):
+        dscft[task[1]].append(entry)
+
+    return (ftv, dscft)
+
+##
+# Write the code file in_path with its tables replaced by ftv and dscft
+# (lists of Entry) to out_path
+#
+def write_tables(in_path, out_path, ftv, dscft):
+    replace_sections(in_path, out_path,
+                     [(FTV_SECTION, [repr([entry.prob for entry in ftv])]),
+                      (DSCFT_SECTION, [repr([[entry.prob for entry in row] for row in dscft])])])
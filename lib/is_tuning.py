@@ -0,0 +1,125 @@
+##
+# This module tunes the failure biasing probability (fb_prob) of the
+# importance sampling simulators with the cross-entropy method.
+#
+# In the degraded state the simulators make a biased draw at every
+# event, which is a failure with probability fb_prob.  fb_prob appears
+# in the likelihood of a path only as p^F (1-p)^(N-F), for N draws of
+# which F were failures, so the cross-entropy update from a pilot run
+# is the weighted failure fraction
+#
+#   p' = sum(w_i F_i) / sum(w_i N_i)
+#
+# where w_i is the sample of iteration i (its likelihood ratio if the
+# iteration lost data, 0 otherwise).  The update is repeated on fresh
+# pilot runs until p settles.  The result is kept only if it gives a
+# lower relative variance than the initial value on a common pilot run.
+#
+
+from sim_analysis_functions import SampleAccumulator
+from parallel_sim import seed_block
+from smp_data_structures import arith
+
+##
+# Stream number of the pilot runs (see parallel_sim.seed_block)
+#
+PILOT_STREAM = 1
+
+class FBProbTuner:
+
+    ##
+    # @param sim: a simulator counting its biased draws in num_fb_draws
+    #             and num_fb_fails (UniformizationBFBOpt or BFBOpt)
+    # @param pilot_iterations: iterations per pilot run
+    # @param max_stages: maximum number of cross-entropy updates
+    # @param smoothing: weight of the new value in each update
+    # @param tolerance: stop once fb_prob changes less than this
+    #
+    def __init__(self, sim, pilot_iterations=2000, max_stages=5, smoothing=0.7,
+                 tolerance=0.01, min_prob=0.05, max_prob=0.95):
+        self.sim = sim
+        self.pilot_iterations = pilot_iterations
+        self.max_stages = max_stages
+        self.smoothing = smoothing
+        self.tolerance = tolerance
+        self.min_prob = min_prob
+        self.max_prob = max_prob
+
+    ##
+    # Run a pilot of pilot_iterations iterations at the current fb_prob
+    #
+    # @return (SampleAccumulator, sum of w_i F_i, sum of w_i N_i)
+    #
+    def run_pilot(self):
+        stats = SampleAccumulator()
+        weighted_fails = 0
+        weighted_draws = 0
+
+        for (sample, pattern, critical_region) in self.sim.run_iterations(self.pilot_iterations):
+            stats.add(sample)
+            if sample != 0:
+                weighted_fails += sample * self.sim.num_fb_fails
+                weighted_draws += sample * self.sim.num_fb_draws
+
+        return (stats, weighted_fails, weighted_draws)
+
+    def set_fb_prob(self, fb_prob):
+        self.sim.fb_prob = arith.real(float(fb_prob))
+        self.sim.is_parms.fb_prob = self.sim.fb_prob
+
+    ##
+    # Squared relative error per sample, to compare pilot runs
+    #
+    def relative_variance(self, stats):
+        if stats.calcMean() == 0:
+            return None
+        return (stats.calcStdDev() / stats.calcMean())**2
+
+    ##
+    # Tune fb_prob, leaving the tuned value in the simulator.  Pilot
+    # runs are seeded from seed, so tuning is repeatable.
+    #
+    # @return (initial fb_prob, tuned fb_prob, estimated variance
+    #          reduction or None if a pilot run saw no data loss)
+    #
+    def tune(self, seed):
+        initial_prob = self.sim.fb_prob
+        fb_prob = float(initial_prob)
+
+        for stage in range(self.max_stages):
+            seed_block(seed, stage, PILOT_STREAM)
+            (stats, weighted_fails, weighted_draws) = self.run_pilot()
+
+            # Without losses there is nothing to learn from
+            if weighted_draws == 0:
+                break
+
+            new_prob = self.smoothing * float(weighted_fails / weighted_draws) + (1 - self.smoothing) * fb_prob
+            new_prob = min(max(new_prob, self.min_prob), self.max_prob)
+
+            done = abs(new_prob - fb_prob) < self.tolerance
+            fb_prob = new_prob
+            self.set_fb_prob(fb_prob)
+            if done:
+                break
+
+        # Compare the initial and tuned values on the same random streams
+        rel_vars = []
+        for prob in (initial_prob, fb_prob):
+            self.set_fb_prob(prob)
+            seed_block(seed, self.max_stages, PILOT_STREAM)
+            (stats, weighted_fails, weighted_draws) = self.run_pilot()
+            rel_vars.append(self.relative_variance(stats))
+        (initial_rel_var, tuned_rel_var) = rel_vars
+
+        reduction = None
+        if initial_rel_var is not None and tuned_rel_var is not None and tuned_rel_var > 0:
+            reduction = initial_rel_var / tuned_rel_var
+
+        # Keep the initial value if the tuned one did no better
+        if reduction is None or reduction < 1:
+            self.set_fb_prob(initial_prob)
+            if reduction is not None:
+                reduction = 1.0
+
+        return (initial_prob, self.sim.fb_prob, reduction)
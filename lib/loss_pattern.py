@@ -0,0 +1,34 @@
+##
+# This module encodes data loss patterns.
+#
+# A data loss pattern is the number of failed disks when data was lost
+# and whether the loss was a sector loss (1) or a whole-disk loss (0).
+# Simulators return it as the small integer num_disks * 2 + sector_loss,
+# which indexes the pattern histograms of SampleAccumulator.  Pattern 0
+# (no failed disks, no sector loss) stands for "no data loss".  Patterns
+# are only formatted, as "(disks, sectors)", for output.
+#
+
+NO_LOSS = 0
+
+def encode_pattern(num_disks, sector_loss):
+    return (num_disks << 1) | sector_loss
+
+##
+# @return (num_disks, sector_loss)
+#
+def decode_pattern(pattern):
+    return (pattern >> 1, pattern & 1)
+
+def is_sector_loss(pattern):
+    return (pattern & 1) == 1
+
+def format_pattern(pattern):
+    return "(%d, %d)" % decode_pattern(pattern)
+
+##
+# Number of patterns of a system of num_components components (the size
+# of its pattern histograms)
+#
+def num_patterns(num_components):
+    return encode_pattern(num_components, 1) + 1
@@ -0,0 +1,48 @@
+##
+# This module contains an index over a minimal erasures list that
+# answers "does any minimal erasure fit inside this erasure pattern".
+#
+# Every symbol has a posting bitmap of the minimal erasures (by their
+# position in the list) that contain it.  A minimal erasure fits inside
+# an erasure pattern unless it contains a surviving symbol, so the
+# query ORs the postings of the surviving symbols and checks whether
+# some minimal erasure is left over.  The work is one big-int OR per
+# surviving symbol (a word operation per 64 minimal erasures) instead
+# of a Python-level test of every minimal erasure.  Postings are
+# visited from the most to the least populated, so that the query
+# usually stops early once every minimal erasure has been ruled out.
+#
+
+from bm_ops import bm_to_list
+
+class MinimalErasureIndex:
+
+    ##
+    # @param mel_bm: minimal erasures, as symbol bitmaps
+    #
+    def __init__(self, mel_bm):
+        self.all_erasures = (1 << len(mel_bm)) - 1
+
+        postings = {}
+        for i in range(len(mel_bm)):
+            for symbol in bm_to_list(mel_bm[i]):
+                postings[symbol] = postings.get(symbol, 0) | (1 << i)
+
+        # (symbol bit, posting) by decreasing posting size
+        self.postings = [(1 << symbol, posting) for (symbol, posting) in postings.items()]
+        self.postings.sort(key=lambda entry: bin(entry[1]).count("1"), reverse=True)
+
+    ##
+    # @param erased_bm: bitmap of the erased symbols
+    # @return True if some minimal erasure is contained in erased_bm
+    #
+    def contains_subset_of(self, erased_bm):
+        ruled_out = 0
+        for (symbol_bit, posting) in self.postings:
+            if erased_bm & symbol_bit:
+                continue
+            ruled_out |= posting
+            if ruled_out == self.all_erasures:
+                return False
+
+        return ruled_out != self.all_erasures
@@ -0,0 +1,115 @@
+##
+# This module derives the minimal erasures list of an XOR code, read by
+# the MEL check of ErasureCode, from its generator matrix.
+#
+# A minimal erasure is a set of erased symbols that cannot be
+# recovered, while every proper subset of it can.  Any m+1 erased
+# symbols leave fewer than k, so no minimal erasure is larger.
+#
+# Recoverability is monotone, so a pattern of w erased symbols is a
+# minimal erasure exactly when it cannot be recovered but each of its
+# w sub-patterns of w-1 symbols can.  Only the unrecoverable patterns
+# are tested this way, and a pattern that contains a smaller minimal
+# erasure is pruned by the test of its sub-patterns.  No weight depends
+# on the results of another, so the patterns of every weight are split
+# by their lowest symbol into tasks for a process pool, and the result
+# does not depend on the number of workers.
+#
+
+import itertools
+from multiprocessing import Pool
+from bm_ops import list_to_bm, bm_to_list
+from erasure_code import ErasureCode
+from fault_tolerance import num_combinations
+
+##
+# Patterns checked per call of the code's batched check
+#
+CHUNK_SIZE = 4096
+
+##
+# Per-process code used by the pool workers
+#
+worker_code = None
+
+def init_worker(code_file):
+    global worker_code
+    worker_code = ErasureCode(code_file, ErasureCode.CHECK_RANK)
+
+##
+# The unrecoverable ones of a chunk of symbol bitmaps that are minimal
+#
+def minimal_in_chunk(code, chunk):
+    lost = code.are_symbol_failures(chunk)
+    unrecoverable = [chunk[i] for i in range(len(chunk)) if lost[i]]
+    if len(unrecoverable) == 0:
+        return []
+
+    sub_patterns = []
+    for bm in unrecoverable:
+        sub_patterns.extend([bm & ~(1 << symbol) for symbol in bm_to_list(bm)])
+    sub_lost = code.are_symbol_failures(sub_patterns)
+
+    minimal = []
+    start = 0
+    for bm in unrecoverable:
+        weight = len(bm_to_list(bm))
+        if not sub_lost[start:start+weight].any():
+            minimal.append(bm)
+        start += weight
+    return minimal
+
+##
+# Minimal erasures of weight symbols whose lowest symbol is lowest,
+# with the worker's code
+#
+# @param task: (weight, lowest)
+# @return list of symbol bitmaps
+#
+def run_task(task):
+    (weight, lowest) = task
+    num_symbols = worker_code.k + worker_code.m
+
+    minimal = []
+    chunk = []
+    for others in itertools.chain(itertools.combinations(range(lowest+1, num_symbols), weight-1), [None]):
+        if others is not None:
+            chunk.append(list_to_bm((lowest,) + others))
+            if len(chunk) < CHUNK_SIZE:
+                continue
+        if len(chunk) > 0:
+            minimal.extend(minimal_in_chunk(worker_code, chunk))
+            chunk = []
+    return minimal
+
+##
+# Compute the minimal erasures list of an XOR code
+#
+# @return list of minimal erasures as symbol lists, by weight and then
+#     in lexicographic order
+#
+def compute_minimal_erasures(code_file, workers=1):
+    # Built here first, so that a failure table is saved once and
+    # shared by the workers
+    code = ErasureCode(code_file, ErasureCode.CHECK_RANK)
+    num_symbols = code.k + code.m
+
+    # Most patterns first, so that the longest tasks do not start last
+    tasks = [(weight, lowest) for weight in range(1, min(code.m+1, num_symbols)+1)
+             for lowest in range(num_symbols-weight+1)]
+    tasks.sort(key=lambda task: num_combinations(num_symbols-task[1]-1, task[0]-1), reverse=True)
+
+    init_worker(code_file)
+    if workers > 1:
+        pool = Pool(workers, init_worker, (code_file,))
+        try:
+            results = pool.map(run_task, tasks, 1)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        results = [run_task(task) for task in tasks]
+
+    mel = [bm_to_list(bm) for result in results for bm in result]
+    mel.sort(key=lambda erasure: (len(erasure), erasure))
+    return mel
@@ -0,0 +1,147 @@
+##
+# This module runs a simulation in fixed-size blocks of iterations,
+# optionally spread across a pool of worker processes.
+#
+# Every block gets its own random streams derived from a master seed
+# and the block number, and block results are merged in block order.
+# The merged result for a given seed is therefore the same whatever
+# the number of workers.
+#
+
+import os
+import random as pyrandom
+from numpy import random
+from multiprocessing import Pool
+
+##
+# Number of iterations per block
+#
+BLOCK_SIZE = 10000
+
+##
+# Draw a fresh master seed
+#
+def new_seed():
+    return int(os.urandom(4).encode('hex'), 16)
+
+##
+# Seed the global random streams (the random module and numpy.random)
+# for block number block of the run with master seed seed.  Other
+# users of the master seed (e.g. pilot runs) pass their own stream
+# number, so that their blocks do not share streams with the run.
+#
+# Both generators are Mersenne Twisters seeded by array, so the key
+# carries a distinct tag per generator to keep the streams apart.
+#
+def seed_block(seed, block, stream=0):
+    key = []
+    while True:
+        key.append(seed & 0xffffffff)
+        seed >>= 32
+        if seed == 0:
+            break
+    key.append(block & 0xffffffff)
+    if stream != 0:
+        key.append(stream)
+
+    random.seed(key + [1])
+
+    py_key = 0
+    for word in reversed(key + [2]):
+        py_key = (py_key << 32) | word
+    pyrandom.seed(py_key)
+
+##
+# Merge the partial results of two blocks.  A block result is the
+# block's SampleAccumulator (see sim_analysis_functions).
+#
+def merge_block_results(total, part):
+    if total is None:
+        return part
+
+    return total.merge(part)
+
+##
+# Per-process simulator used by the pool workers
+#
+worker_sim = None
+
+def init_worker(sim):
+    global worker_sim
+    worker_sim = sim
+
+def run_block(block):
+    (seed, block_num, num_iterations) = block
+    seed_block(seed, block_num)
+    return worker_sim.run_block(num_iterations)
+
+##
+# Split num_iterations into blocks, run them (on workers processes)
+# and return the merged block result and the number of iterations run.
+#
+# If done is given it is called with every block result, in block 
+# order, and the run stops after the first block for which it returns 
+# True.  Blocks already started on other workers are discarded, so the
+# blocks that make up the result do not depend on the number of workers.
+#
+# A run can be continued from an earlier one: start is the earlier
+# (merged result, next block number, iterations run), and num_iterations
+# counts the earlier iterations too.  If on_block is given it is called
+# as on_block(merged result, next block number, iterations run) after
+# every block (e.g. to write a checkpoint).
+#
+# @param sim: object with a run_block(num_iterations) method
+#
+def run_blocks(sim, num_iterations, seed, workers=1, block_size=BLOCK_SIZE, done=None,
+               start=None, on_block=None):
+    if start is None:
+        start = (None, 0, 0)
+    (total, next_block, iterations_run) = start
+
+    def blocks():
+        block_num = next_block
+        remaining = num_iterations - iterations_run
+        while remaining > 0:
+            size = min(block_size, remaining)
+            yield (seed, block_num, size)
+            block_num += 1
+            remaining -= size
+
+    if workers <= 1:
+        init_worker(sim)
+        for block in blocks():
+            part = run_block(block)
+            total = merge_block_results(total, part)
+            iterations_run += block[2]
+            if on_block is not None:
+                on_block(total, block[1] + 1, iterations_run)
+            if done is not None and done(part) is True:
+                break
+    else:
+        pool = Pool(workers, init_worker, (sim,))
+        pending = []
+        todo = blocks()
+        while True:
+            # Keep a couple of blocks queued per worker
+            while len(pending) < 2*workers:
+                try:
+                    block = todo.next()
+                except StopIteration:
+                    break
+                pending.append((block, pool.apply_async(run_block, (block,))))
+            if len(pending) == 0:
+                break
+
+            (block, result) = pending.pop(0)
+            part = result.get()
+            total = merge_block_results(total, part)
+            iterations_run += block[2]
+            if on_block is not None:
+                on_block(total, block[1] + 1, iterations_run)
+            if done is not None and done(part) is True:
+                break
+
+        pool.terminate()
+        pool.join()
+
+    return (total, iterations_run)
@@ -0,0 +1,190 @@
+##
+# This module contains a regenerative simulator that only simulates
+# degraded episodes.
+#
+# Data loss can only happen between a first failure (leaving the all-
+# healthy state) and the return to the all-healthy state.  Each iteration
+# simulates one such episode, started at a first failure drawn from the
+# first-failure process over the mission, until it regenerates (all
+# components repaired), loses data or reaches the end of the mission.
+#
+# Episodes start at rate L'(t) P(all healthy at t), where L'(t) is the
+# sum of the component hazards at age t.  With E[D] the mean episode
+# duration, P(all healthy at t) is taken as 1 / (1 + L'(t) E[D]) (the
+# share of healthy time in a renewal cycle at the current rates).  Start
+# times are drawn from L'(t) / L(M) over the mission [0, M] and a loss
+# is weighted by L(M) / (1 + L'(t) E[D]), which estimates the expected
+# number of data losses per mission (the probability of data loss when
+# losses are rare).  E[D] is measured on pilot episodes in init().
+#
+# The estimate is approximate for Weibull shapes other than 1: other
+# components are taken to be as old as the mission at the start of an
+# episode, while some have been renewed by repairs in earlier episodes.
+#
+
+from simulation import *
+from regular_simulation import RegularSimulation
+import random as pyrandom
+
+##
+# Number of pilot episodes used to measure the mean episode duration, 
+# and the seed of the pilot (so that it does not depend on the run's seed)
+#
+PILOT_EPISODES = 2000
+PILOT_SEED = 1
+
+class RegenerativeSimulation(RegularSimulation):
+
+    ##
+    # __init__() from Simulation
+    #
+
+    ##
+    # Initialize the simulation
+    #
+    def init(self):
+        RegularSimulation.init(self)
+
+        # Expected number of first failures of each component over the mission
+        self.component_episodes = []
+        for component in self.components:
+            dist = component.component_fail_distr
+            if self.mission_time > dist.location:
+                self.component_episodes.append(((self.mission_time - dist.location) / dist.scale)**dist.shape)
+            else:
+                self.component_episodes.append(arith.real(0))
+
+        self.expected_episodes = arith.real(0)
+        for episodes in self.component_episodes:
+            self.expected_episodes += episodes
+
+        self.mean_episode_duration = arith.real(0)
+        if self.expected_episodes > 0:
+            self.mean_episode_duration = self.measure_episode_duration(PILOT_EPISODES)
+
+    ##
+    # Measure the mean duration of num_episodes episodes.  The global 
+    # random streams are seeded for the pilot and restored afterwards.
+    #
+    def measure_episode_duration(self, num_episodes):
+        numpy_state = random.get_state()
+        py_state = pyrandom.getstate()
+        random.seed(PILOT_SEED)
+        pyrandom.seed(PILOT_SEED)
+
+        total = arith.real(0)
+        for i in range(num_episodes):
+            (start_time, end_time, loss) = self.run_episode()
+            total += end_time - start_time
+
+        random.set_state(numpy_state)
+        pyrandom.setstate(py_state)
+
+        return total / num_episodes
+
+    ##
+    # Sum of the failure hazards of all components at age t
+    #
+    def get_fail_hazard(self, t):
+        hazard = arith.real(0)
+        for component in self.components:
+            dist = component.component_fail_distr
+            if t > dist.location:
+                hazard += dist.hazard_rate(t)
+        return hazard
+
+    ##
+    # Draw the start of an episode: the component that fails first is
+    # picked in proportion to its expected number of first failures, and
+    # the time from its failure intensity over the mission.
+    #
+    # @return (start time, failed component id)
+    #
+    def draw_episode_start(self):
+        draw = random.uniform() * self.expected_episodes
+        comp = len(self.components) - 1
+        for i in range(len(self.components)):
+            draw -= self.component_episodes[i]
+            if draw < 0:
+                comp = i
+                break
+
+        dist = self.components[comp].component_fail_distr
+        U = random.uniform()
+        start_time = dist.location + dist.scale * (U * self.component_episodes[comp])**(arith.real(1)/dist.shape)
+
+        return (start_time, comp)
+
+    ##
+    # Set up the simulator at the start of an episode: comp fails at
+    # start_time, all other components have been working since time 0
+    #
+    def start_episode(self, start_time, comp):
+        self.state.reset()
+
+        self.component_table.reset(0)
+
+        self.reset_lr()
+        self.reset_sector_cmc()
+
+        self.sim_clock.update(start_time)
+        self.components[comp].fail_component(start_time)
+        self.state.update_state(Component.EVENT_COMP_FAIL, (comp,))
+
+        if self.first_failure.identical is True:
+            self.pool = [i for i in range(len(self.components)) if i != comp]
+        else:
+            self.pool = []
+
+        self.redraw_events(start_time)
+
+    ##
+    # Simulate one episode
+    #
+    # @return (start time, end time, (pattern, critical_region) on data
+    #          loss or None)
+    #
+    def run_episode(self):
+        (start_time, comp) = self.draw_episode_start()
+        self.start_episode(start_time, comp)
+
+        curr_time = start_time
+        loss = self.get_data_loss(curr_time)
+
+        while loss is None:
+            (event_time, event_type, component_id) = self.get_next_event(curr_time)
+
+            if event_time > self.mission_time:
+                curr_time = self.mission_time
+                break
+            curr_time = event_time
+
+            self.sim_clock.update(event_time)
+            self.state.update_state(event_type, (component_id,))
+
+            if event_type == Component.EVENT_COMP_REPAIR:
+                # Back to the all-healthy state: the episode is over
+                if self.state.get_num_component_fail() == 0:
+                    break
+                continue
+
+            loss = self.get_data_loss(curr_time)
+
+        return (start_time, curr_time, loss)
+
+    ##
+    # Run an iteration: one degraded episode
+    #
+    def run_iteration(self):
+        if self.expected_episodes == 0:
+            return (0, NO_LOSS, 0)
+
+        (start_time, end_time, loss) = self.run_episode()
+
+        (sample, pattern, critical_region) = self.get_iteration_result(loss)
+        if sample == 0:
+            return (0, NO_LOSS, 0)
+
+        weight = self.expected_episodes / (1 + self.get_fail_hazard(start_time) * self.mean_episode_duration)
+
+        return (weight * sample, pattern, critical_region)
@@ -1,4 +1,5 @@
 from simulation import *
+from event_calendar import EventCalendar
 
 class RegularSimulation(Simulation):
     
@@ -11,47 +12,63 @@ class RegularSimulation(Simulation):
     #
     def init(self):
         # Initialize the state of the system
-        self.state = State([i for i in range(self.num_components)])
+        self.state = State([i for i in range(self.num_components)], self.eras_code.new_decoder(self.num_components))
         
         # Set up structure for component repairs
         self.component_repair_start = [0 for i in range(len(self.components))]
         self.component_repairs = [0 for i in range(len(self.components))]
+        self.component_failures = [0 for i in range(len(self.components))]
+
+        # Pending failures of available components and repairs of failed ones.
+        # The last failure calendar slot holds the pool (see schedule_pool).
+        self.pool_id = len(self.components)
+        self.fail_calendar = EventCalendar(len(self.components)+1)
+        self.repair_calendar = EventCalendar(len(self.components))
+
+        # Skip-ahead sampler for components that have not failed yet
+        self.first_failure = FirstFailureSampler(self.components)
+        self.first_failure_location = self.components[0].component_fail_distr.location
         
          # Reset LR
-        self.lr = mpf(1) 
+        self.reset_lr()
           
     ##
     # Reset the simulation
     #
     def reset(self):
          # Reset system state
-        self.state = State(self.components)
+        self.state.reset()
+        
+        # Set up structure for component repairs
+        self.component_repairs = [0 for i in range(len(self.components))]
+        self.repair_calendar.clear()
         
         # Draw first component fail times
         self.component_failures = [0 for i in range(len(self.components))]
+        self.fail_calendar.clear()
         
-        i=0
-        for component in self.components:
-            self.component_failures[i] = component.component_fail_distr.draw()
-            i+=1
-        
-        # Set up structure for component repairs
-        self.component_repairs = [0 for i in range(len(self.components))]
+        if self.first_failure.identical is True:
+            self.pool = [i for i in range(len(self.components))]
+            self.schedule_pool(0)
+        else:
+            self.pool = []
+            for i in range(len(self.components)):
+                self.set_comp_fail(i, 0)
         
         self.sim_time = 0
         
-        for component in self.components:
-            component.init_clock(0)
-            component.init_state()
+        self.component_table.reset(0)
         
          # Reset LR
-        self.lr = mpf(1) 
+        self.reset_lr()
     
     ##
     # Set new component failure time for component comp_idx
     #
     def set_comp_fail(self, comp_idx, curr_time):
         self.component_failures[comp_idx] = self.components[comp_idx].component_fail_distr.draw() + curr_time
+        self.repair_calendar.cancel(comp_idx)
+        self.fail_calendar.schedule(comp_idx, self.component_failures[comp_idx])
        
     ##
     # Set new component repair time for component comp_idx
@@ -59,93 +76,108 @@ class RegularSimulation(Simulation):
     def set_comp_repair(self, comp_idx, curr_time):
         self.component_repairs[comp_idx] = self.components[comp_idx].component_repair_distr.draw() + curr_time 
         self.component_repair_start[comp_idx] = curr_time 
+        self.fail_calendar.cancel(comp_idx)
+        self.repair_calendar.schedule(comp_idx, self.component_repairs[comp_idx])
         
     ##
-    # Get the next failure event
+    # Components with identical failure distributions that have not failed
+    # yet in this iteration are kept in a pool.  The pool has a single 
+    # entry in the failure calendar: the first failure among its members,
+    # drawn in one step given that all of them survived to curr_time.
+    # Members get their own failure time once they are repaired.
     #
-    def get_next_failure(self, avail_comps):
-        
-        if len(avail_comps) == 0:
-            return (None, None)
-        
-        comp_idx = avail_comps[0]
-        fail_time = self.component_failures[avail_comps[0]]
-        
-        for i in avail_comps[1:]:
-            if self.component_failures[i] < fail_time and self.component_failures[i] > 0:
-                comp_idx = i
-                fail_time = self.component_failures[i]
-                
-        return (fail_time, comp_idx)
+    def schedule_pool(self, curr_time):
+        if len(self.pool) == 0:
+            self.fail_calendar.cancel(self.pool_id)
+            return
+
+        location = self.first_failure_location
+        age = max(curr_time - location, 0)
+        base = max(curr_time, location)
+        self.fail_calendar.schedule(self.pool_id, base + self.first_failure.draw_min_residual(len(self.pool), age))
+
+    ##
+    # Pick the pool member that fails at curr_time (all members are
+    # equally likely) and schedule the pool's next failure
+    #
+    def take_from_pool(self, curr_time):
+        idx = random.randint(0, len(self.pool))
+        comp_idx = self.pool[idx]
+        self.pool[idx] = self.pool[-1]
+        self.pool.pop()
+
+        self.schedule_pool(curr_time)
+
+        return comp_idx
+
+    ##
+    # Draw all pending failure and repair times afresh, given the ages of
+    # the components at curr_time (e.g. to start from a saved or made-up
+    # state).  Pool members are taken to have survived to curr_time.
+    #
+    def redraw_events(self, curr_time):
+        self.fail_calendar.clear()
+        self.repair_calendar.clear()
+
+        in_pool = set(self.pool)
+        for i in range(len(self.components)):
+            comp = self.components[i]
+            if comp.state == Component.STATE_FAILED:
+                self.component_repairs[i] = curr_time + comp.component_repair_distr.draw_residual(curr_time - comp.repair_start)
+                self.component_repair_start[i] = comp.repair_start
+                self.repair_calendar.schedule(i, self.component_repairs[i])
+            elif i not in in_pool:
+                self.component_failures[i] = curr_time + comp.component_fail_distr.draw_residual(curr_time - comp.begin_time)
+                self.fail_calendar.schedule(i, self.component_failures[i])
+
+        self.schedule_pool(curr_time)
+
+    ##
+    # Get the next failure event (earliest failure of an available component)
+    #
+    def get_next_failure(self, avail_comps=None):
+        return self.fail_calendar.peek()
     
     ##
-    # Get the next repair event
+    # Get the next repair event (earliest repair of a failed component)
     #
-    def get_next_repair(self, failed_comps):
-        
-        if len(failed_comps) == 0:
-            return (None, None)
-        
-        comp_idx = failed_comps[0]
-        repair_time = self.component_repairs[failed_comps[0]]
-        
-        for i in failed_comps[1:]:
-            if self.component_repairs[i] < repair_time and self.component_repairs[i] > 0:
-                comp_idx = i
-                repair_time = self.component_repairs[i]
-        
-        return (repair_time, comp_idx)
+    def get_next_repair(self, failed_comps=None):
+        return self.repair_calendar.peek()
         
     ##
     # Get the next event
     #  
     def get_next_event(self, curr_time):
-        failed_comps = self.state.get_failed_components()
-        avail_comps = self.state.get_avail_components()
-        
-        if len(failed_comps) == 0:
-            (fail_time, comp_idx) = self.get_next_failure(avail_comps)
+        (fail_time, fail_comp_idx) = self.get_next_failure()
+        (repair_time, repair_comp_idx) = self.get_next_repair()
             
+        if repair_time is None or (fail_time is not None and fail_time < repair_time):
+            if fail_comp_idx == self.pool_id:
+                fail_comp_idx = self.take_from_pool(fail_time)
+
             ##
             # Update internal component state
             #
-            self.components[comp_idx].fail_component(fail_time)
-            
+            self.components[fail_comp_idx].fail_component(fail_time)
+                
             ##
             # Draw component repair time
             #
-            self.set_comp_repair(comp_idx, fail_time)
-            
-            return (fail_time, Component.EVENT_COMP_FAIL, comp_idx)
-        
-        else:
-            (fail_time, fail_comp_idx) = self.get_next_failure(avail_comps)
-            (repair_time, repair_comp_idx) = self.get_next_repair(failed_comps)
-            
-            if fail_time < repair_time:
-                ##
-                # Update internal component state
-                #
-                self.components[fail_comp_idx].fail_component(fail_time)
-                
-                ##
-                # Draw component repair time
-                #
-                self.set_comp_repair(fail_comp_idx, fail_time)
+            self.set_comp_repair(fail_comp_idx, fail_time)
                 
-                return (fail_time, Component.EVENT_COMP_FAIL, fail_comp_idx)
-            else:
-                ##
-                # Update internal component state
-                #
-                self.components[repair_comp_idx].repair_component()
+            return (fail_time, Component.EVENT_COMP_FAIL, fail_comp_idx)
+        else:
+            ##
+            # Update internal component state
+            #
+            self.components[repair_comp_idx].repair_component()
                 
-                ##
-                # Draw component fail time
-                #
-                self.set_comp_fail(repair_comp_idx, repair_time)
+            ##
+            # Draw component fail time
+            #
+            self.set_comp_fail(repair_comp_idx, repair_time)
                 
-                return (repair_time, Component.EVENT_COMP_REPAIR, repair_comp_idx)
+            return (repair_time, Component.EVENT_COMP_REPAIR, repair_comp_idx)
         
     
     
\ No newline at end of file
@@ -0,0 +1,196 @@
+##
+# This module contains an importance splitting (RESTART) simulator.
+#
+# Levels are the number of failed components.  When a trajectory
+# reaches i failed components it is split into factors[i-1] copies:
+# itself and factors[i-1]-1 retrials started from a copy of its state.
+# A retrial ends when it goes back below the level it was started in,
+# while the trajectory it was split from goes on.  An event seen with
+# i failed components before the split at i is weighted by
+# 1/(factors[0] * ... * factors[i-2]), which makes the sum of the
+# weighted data loss events of an iteration an unbiased estimate of
+# the probability of data loss.
+#
+# The system evolves under the real failure and repair distributions
+# (no likelihood ratio), so the method stays well behaved for codes
+# with a high fault tolerance, where the likelihood ratios of failure
+# biasing get noisy.
+#
+
+from simulation import *
+from regular_simulation import RegularSimulation
+
+##
+# Splitting factor used on the levels between one failure and data loss
+#
+DEFAULT_SPLITTING_FACTOR = 8
+
+class RestartSimulation(RegularSimulation):
+
+    ##
+    # __init__() from Simulation, is_parms is a SplittingParms
+    #
+
+    ##
+    # Initialize the simulation
+    #
+    def init(self):
+        RegularSimulation.init(self)
+
+        factors = None
+        if self.is_parms is not None:
+            factors = self.is_parms.factors
+
+        if factors is None:
+            factors = [1] + [DEFAULT_SPLITTING_FACTOR for i in range(2, self.eras_code.min_disk_failures)]
+
+        self.factors = [int(factor) for factor in factors]
+
+        # weights[i] is the weight of a trajectory split at levels 1 .. i
+        self.weights = [arith.real(1)]
+        for factor in self.factors:
+            self.weights.append(self.weights[-1] / factor)
+
+    ##
+    # Splitting factor on reaching num_failed failed components
+    #
+    def get_factor(self, num_failed):
+        if num_failed < 1 or num_failed > len(self.factors):
+            return 1
+        return self.factors[num_failed-1]
+
+    ##
+    # Weight of a trajectory that has been split at levels 1 .. level
+    #
+    def get_weight(self, level):
+        return self.weights[min(level, len(self.weights)-1)]
+
+    ##
+    # The weight of an event seen now (in place of a likelihood ratio,
+    # for the conditional Monte Carlo sector check)
+    #
+    def get_lr(self):
+        return self.get_weight(self.state.get_num_component_fail()-1)
+
+    ##
+    # Snapshot the state of the simulation at curr_time: system state,
+    # component clocks and probability of no sector loss so far.  Pending
+    # events are not part of the snapshot, they are redrawn when the
+    # snapshot is restored.
+    #
+    def save_state(self, curr_time):
+        state = State()
+        state.copy(self.state)
+
+        clocks = self.component_table.save()
+
+        return (curr_time, state, clocks, self.pool[:], self.sector_survival)
+
+    ##
+    # Restore a snapshot taken by save_state
+    #
+    # @return the time of the snapshot
+    #
+    def restore_state(self, snapshot):
+        (curr_time, state, clocks, pool, self.sector_survival) = snapshot
+
+        self.state.copy(state)
+
+        self.component_table.restore(clocks)
+
+        self.pool = pool[:]
+        self.sim_clock.update(curr_time)
+        self.redraw_events(curr_time)
+
+        return curr_time
+
+    ##
+    # Run a trajectory from curr_time until the end of the mission, data
+    # loss, or (for a retrial) until it leaves the level it started in.
+    # Retrials split from it are pushed on retrials.
+    #
+    # @return (weight, pattern, critical_region) on data loss, None otherwise
+    #
+    def run_trajectory(self, curr_time, level, retrials):
+        while 1:
+            (event_time, event_type, component_id) = self.get_next_event(curr_time)
+            curr_time = event_time
+
+            if event_time > self.mission_time:
+                return None
+
+            self.sim_clock.update(event_time)
+            self.state.update_state(event_type, (component_id,))
+            num_failed = self.state.get_num_component_fail()
+
+            if event_type == Component.EVENT_COMP_REPAIR:
+                if num_failed < level:
+                    return None
+                continue
+
+            # The check belongs to the level being left, before the split
+            loss = self.get_data_loss(curr_time)
+            if loss is not None:
+                return (self.get_lr() * self.sector_survival, loss[0], loss[1])
+
+            for i in range(self.get_factor(num_failed) - 1):
+                retrials.append((self.save_state(curr_time), num_failed))
+
+    ##
+    # Run an iteration: a trajectory over the mission and all its
+    # retrials.  The sample is the weighted number of data loss events.
+    # The pattern is the heaviest pattern (whole-disk losses first), and
+    # the critical region is the weighted mean of the losses' critical
+    # regions (1 for sector losses), so that critical_region * sample
+    # is the weighted number of sectors lost.
+    #
+    def run_iteration(self):
+        self.reset()
+        self.reset_sector_cmc()
+
+        sample = arith.real(0)
+        sectors_lost = arith.real(0)
+        pattern_weights = {}
+        disk_loss = False
+
+        retrials = [(None, 0)]
+        while len(retrials) > 0:
+            (snapshot, level) = retrials.pop()
+            if snapshot is None:
+                curr_time = 0
+            else:
+                curr_time = self.restore_state(snapshot)
+
+            loss = self.run_trajectory(curr_time, level, retrials)
+            if loss is None:
+                continue
+
+            (weight, pattern, critical_region) = loss
+            logging.debug("Data loss %s, weight %e" % (format_pattern(pattern), weight))
+
+            sample += weight
+            if not pattern_weights.has_key(pattern):
+                pattern_weights[pattern] = 0
+            pattern_weights[pattern] += weight
+
+            if not is_sector_loss(pattern):
+                disk_loss = True
+                sectors_lost += weight * critical_region
+            else:
+                sectors_lost += weight
+
+        # Expected sector losses of the conditional Monte Carlo mode
+        if self.sector_loss > 0:
+            sample += self.sector_loss
+            sectors_lost += self.sector_loss
+            pattern_weights[encode_pattern(self.eras_code.min_disk_failures-1, 1)] = self.sector_loss
+
+        if sample == 0:
+            return (0, NO_LOSS, 0)
+
+        patterns = pattern_weights.keys()
+        if disk_loss is True:
+            patterns = [pattern for pattern in patterns if not is_sector_loss(pattern)]
+        patterns.sort(key=lambda pattern: pattern_weights[pattern], reverse=True)
+
+        return (sample, patterns[0], sectors_lost / sample)
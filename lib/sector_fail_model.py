@@ -8,6 +8,11 @@ from plotting import DataPoints, Plotting
 
 mp.prec += 75
 
+##
+# Number of points in the table of a time dependent model
+#
+DEFAULT_TABLE_POINTS = 1025
+
 class SectorFailModel:
     def __init__(self, total_num_sectors, sectors_per_region, scrub_interval, sector_fail_prob, request_rate=1, write_ratio=1):
         self.total_num_sectors = total_num_sectors
@@ -26,36 +31,104 @@ class SectorFailModel:
         self.sector_fail_prob = sector_fail_prob
         
         self.write_ratio = write_ratio
-    
+
+        # Cached probability of a bad sector (for models that do not 
+        # depend on time) and interpolation table (for models that do)
+        self.cached_prob = None
+        self.prob_table = None
+
+    ##
+    # Does the probability of a bad sector depend on the age of the disk?
+    #
+    time_dependent = False
+
+    ##
+    # Probability that a disk has a bad sector at age time.  This is 
+    # evaluated once per configuration (calc_prob_of_bad_sector is costly
+    # at high precision): models that do not depend on time cache it, 
+    # the others interpolate in a table made by make_table.
+    #
     def prob_of_bad_sector(self, time=0):
+        if self.time_dependent is False:
+            if self.cached_prob is None:
+                self.cached_prob = self.calc_prob_of_bad_sector()
+            return self.cached_prob
+
+        if self.prob_table is None:
+            return self.calc_prob_of_bad_sector(time)
+        return self.prob_table.lookup(time)
+
+    ##
+    # Tabulate the probability of a bad sector for ages 0 .. max_time
+    # (time dependent models only)
+    #
+    def make_table(self, max_time, num_points=DEFAULT_TABLE_POINTS):
+        if self.time_dependent is True:
+            self.prob_table = SectorFailTable(self, max_time, num_points)
+
+    def calc_prob_of_bad_sector(self, time=0):
         return 0 
 
 class RandomScrubSectorFailModel(SectorFailModel):
     
-    def prob_of_bad_sector(self, time=0):
+    def calc_prob_of_bad_sector(self, time=0):
         prob = ((self.request_rate * self.disk_scrub_period) / (1+(self.request_rate * self.disk_scrub_period))) * (self.sector_fail_prob*self.write_ratio)
 
         return 1 - ((1 - prob)**self.total_num_sectors)
     
 class DeterministicScrubSectorFailModel(SectorFailModel):
 
-    def prob_of_bad_sector(self, time=0):
+    def calc_prob_of_bad_sector(self, time=0):
         prob = (1 - ((1-exp(-self.request_rate * self.disk_scrub_period))/(self.request_rate * self.disk_scrub_period)))*(self.sector_fail_prob*self.write_ratio)
         
         return 1 - ((1 - prob)**self.total_num_sectors)
     
 class BERSectorFailModel(SectorFailModel):
         
-    def prob_of_bad_sector(self, time=0):
+    def calc_prob_of_bad_sector(self, time=0):
         prob = self.sector_fail_prob
         return 1 - ((1 - self.sector_fail_prob)**self.total_num_sectors)
         #return (self.sector_fail_prob*self.total_num_sectors)
 
 class NoScrubSectorFailModel(SectorFailModel):
         
-    def prob_of_bad_sector(self, time=0):
+    def calc_prob_of_bad_sector(self, time=0):
         prob = self.write_ratio * self.sector_fail_prob
         return 1 - ((1 - prob)**self.total_num_sectors)
+
+##
+# Latent sector errors that are never scrubbed: each sector goes bad at
+# rate request_rate * write_ratio * sector_fail_prob, so the probability
+# of a bad sector grows with the age of the disk.
+#
+class AccumulatingSectorFailModel(SectorFailModel):
+
+    time_dependent = True
+
+    def calc_prob_of_bad_sector(self, time=0):
+        rate = self.request_rate * self.write_ratio * self.sector_fail_prob
+        prob = 1 - exp(-rate * time)
+        return 1 - ((1 - prob)**self.total_num_sectors)
+
+##
+# Probability of a bad sector of a time dependent model, tabulated at
+# num_points evenly spaced ages over [0, max_time] and linearly 
+# interpolated in between.  Ages past max_time get the last value.
+#
+class SectorFailTable:
+
+    def __init__(self, model, max_time, num_points=DEFAULT_TABLE_POINTS):
+        self.step = float(max_time) / (num_points - 1)
+        self.probs = [float(model.calc_prob_of_bad_sector(self.step * i)) for i in range(num_points)]
+
+    def lookup(self, time):
+        pos = float(time) / self.step
+        i = int(pos)
+        if i >= len(self.probs) - 1:
+            return self.probs[-1]
+        if i < 0:
+            return self.probs[0]
+        return self.probs[i] + (pos - i) * (self.probs[i+1] - self.probs[i])
     
 def test():
     bytes_in_terabyte = 1099511627776
@@ -7,6 +7,8 @@
 
 from mpmath import *
 import random
+import time
+import numpy
 
 #
 # A Class that incapsulates a set of samples with 
@@ -120,6 +122,222 @@ class Samples:
 	def get_num_zeroes(self):
 		return self.num_zeroes
 
+#
+# Streaming replacement for Samples: an accumulator that keeps the 
+# sample count, the number of zero samples, the mean and sum of squared
+# deviations (Welford's update), and per-pattern counts and sums.
+# Patterns are small integers (see loss_pattern.py) that index fixed-size
+# histograms of counts and sums, grown if a larger pattern is seen.
+# Memory use does not depend on the number of samples, and two 
+# accumulators (e.g. from two workers) can be merged exactly.
+#
+# Only non-zero samples go through the Welford update; the zeroes are 
+# folded in when the statistics are read.
+#
+class SampleAccumulator:
+
+	def __init__(self, num_patterns=0):
+		self.num_samples = 0
+		self.num_zeroes = 0
+
+		# Mean and sum of squared deviations of the non-zero samples
+		self.nz_mean = mpf(0)
+		self.nz_m2 = mpf(0)
+
+		# Number of samples and sum of samples per pattern (the sums
+		# are objects so that they keep mpf precision)
+		self.pattern_counts = numpy.zeros(num_patterns, dtype=int)
+		self.pattern_sums = numpy.zeros(num_patterns, dtype=object)
+
+		# Sum of the loss amounts given with the samples
+		self.loss_sum = 0
+
+		# Hits and misses of the erasure code's failure check cache
+		# while the samples were drawn
+		self.cache_hits = 0
+		self.cache_misses = 0
+
+		self.conf_lvl_lku = Samples([]).conf_lvl_lku
+
+	#
+	# Add a sample
+	#
+	# @param sample: the sample
+	# @param pattern: the pattern (index) the sample belongs to, if any
+	# @param loss: an amount to add to loss_sum
+	#
+	def add(self, sample, pattern=None, loss=0):
+		self.num_samples += 1
+
+		if pattern is not None:
+			if pattern >= len(self.pattern_counts):
+				self.grow(pattern+1)
+			self.pattern_counts[pattern] += 1
+			self.pattern_sums[pattern] += sample
+
+		if sample == 0:
+			self.num_zeroes += 1
+			return
+
+		self.loss_sum += loss
+
+		num_nonzero = self.num_samples - self.num_zeroes
+		delta = sample - self.nz_mean
+		self.nz_mean += delta / num_nonzero
+		self.nz_m2 += delta * (sample - self.nz_mean)
+
+	#
+	# Add arrays of (float) samples, their patterns and loss amounts at 
+	# once: the histograms are bincounts and the moments are merged as
+	# those of one block
+	#
+	def add_samples(self, samples, patterns, losses):
+		nonzero = samples != 0
+		nz_samples = samples[nonzero]
+
+		block = SampleAccumulator()
+		block.num_samples = len(samples)
+		block.num_zeroes = len(samples) - len(nz_samples)
+		if len(nz_samples) > 0:
+			nz_mean = nz_samples.mean()
+			block.nz_mean = mpf(nz_mean)
+			block.nz_m2 = mpf(((nz_samples - nz_mean)**2).sum())
+		block.loss_sum = losses[nonzero].sum()
+
+		if len(patterns) > 0:
+			num_patterns = max(len(self.pattern_counts), patterns.max()+1)
+			block.pattern_counts = numpy.bincount(patterns, minlength=num_patterns)
+			block.pattern_sums = numpy.bincount(patterns, weights=samples, minlength=num_patterns).astype(object)
+
+		self.merge(block)
+
+	#
+	# Merge another accumulator into this one
+	#
+	def merge(self, other):
+		num_nonzero = self.num_samples - self.num_zeroes
+		other_nonzero = other.num_samples - other.num_zeroes
+		total_nonzero = num_nonzero + other_nonzero
+
+		if other_nonzero > 0:
+			delta = other.nz_mean - self.nz_mean
+			self.nz_mean += delta * other_nonzero / total_nonzero
+			self.nz_m2 += other.nz_m2 + delta**2 * num_nonzero * other_nonzero / total_nonzero
+
+		self.num_samples += other.num_samples
+		self.num_zeroes += other.num_zeroes
+		self.loss_sum += other.loss_sum
+		self.cache_hits += other.cache_hits
+		self.cache_misses += other.cache_misses
+
+		num_patterns = len(other.pattern_counts)
+		if num_patterns > len(self.pattern_counts):
+			self.grow(num_patterns)
+		self.pattern_counts[:num_patterns] += other.pattern_counts
+		self.pattern_sums[:num_patterns] += other.pattern_sums
+
+		return self
+
+	#
+	# Grow the pattern histograms to num_patterns patterns
+	#
+	def grow(self, num_patterns):
+		counts = numpy.zeros(num_patterns, dtype=int)
+		sums = numpy.zeros(num_patterns, dtype=object)
+		counts[:len(self.pattern_counts)] = self.pattern_counts
+		sums[:len(self.pattern_sums)] = self.pattern_sums
+		self.pattern_counts = counts
+		self.pattern_sums = sums
+
+	#
+	# Patterns seen so far
+	#
+	def get_patterns(self):
+		return numpy.nonzero(self.pattern_counts)[0]
+
+	def calcMean(self):
+		if self.num_zeroes == self.num_samples:
+			return mpf(0)
+
+		return self.nz_mean * (self.num_samples - self.num_zeroes) / self.num_samples
+
+	def calcStdDev(self):
+		if self.num_zeroes == self.num_samples or self.num_samples < 2:
+			return mpf(0)
+
+		num_nonzero = self.num_samples - self.num_zeroes
+		m2 = self.nz_m2 + self.nz_mean**2 * num_nonzero * self.num_zeroes / self.num_samples
+
+		return sqrt(m2 / (self.num_samples-1))
+
+	#
+	# Calculate the relative error (as in Samples.calcRE)
+	#
+	def calcRE(self, conf_level="0.90"):
+		if self.num_zeroes == self.num_samples:
+			return mpf(0)
+
+		return (self.conf_lvl_lku[conf_level] * (self.calcStdDev() / sqrt(self.num_samples))) / self.calcMean()
+
+	#
+	# Calculate the confidence interval around the sample mean (as in Samples.calcConfInterval)
+	#
+	def calcConfInterval(self, conf_level="0.90"):
+		if self.num_zeroes == self.num_samples:
+			return (mpf(0), mpf(0))
+
+		if conf_level not in self.conf_lvl_lku.keys():
+			print "%s not a valid confidence level!" % conf_level
+			return None
+
+		mean = self.calcMean()
+		half_width = abs(self.conf_lvl_lku[conf_level] * (self.calcStdDev() / sqrt(self.num_samples)))
+
+		return (abs(mean - half_width), mean + half_width)
+
+	def get_num_zeroes(self):
+		return self.num_zeroes
+
+	#
+	# Hit rate of the failure check cache, None if it was not used
+	#
+	def get_cache_hit_rate(self):
+		lookups = self.cache_hits + self.cache_misses
+		if lookups == 0:
+			return None
+		return float(self.cache_hits) / lookups
+
+#
+# Sequential stopping rule for a simulation run in blocks: called with 
+# each block's SampleAccumulator, it returns True once the relative error of the running mean is at most 
+# target_re, or once max_time seconds have passed.
+#
+class StoppingRule:
+
+	def __init__(self, target_re=None, max_time=None, conf_level="0.90"):
+		self.target_re = target_re
+		self.max_time = max_time
+		self.conf_level = conf_level
+		self.stats = SampleAccumulator()
+		self.start_time = time.time()
+
+	def __call__(self, block):
+		self.stats.merge(block)
+
+		return self.reached()
+
+	#
+	# Has the rule been met by the samples seen so far?
+	#
+	def reached(self):
+		if self.max_time is not None and time.time() - self.start_time >= self.max_time:
+			return True
+
+		if self.target_re is None or self.stats.calcMean() == 0:
+			return False
+
+		return self.stats.calcRE(self.conf_level) <= self.target_re
+
 #
 # Generate samples from a known distribution and verify the statistics
 #
@@ -137,6 +355,12 @@ def test():
 	print "Mean: %s (%s): " % (s.calcMean(), mean)
 	print "Std Dev: %s (%s): " % (s.calcStdDev(), std_dev)
 	print "Conf. Interval: (%s, %s)" % s.calcConfInterval("0.995")
+
+	acc = SampleAccumulator()
+	for sample in samples:
+		acc.add(sample)
+
+	print "Accumulator mean: %s, std dev: %s" % (acc.calcMean(), acc.calcStdDev())
 	
 
 if __name__ == "__main__":
@@ -17,7 +17,13 @@ from simulation import Simulation, ISParms
 from unif_bfb_gen_repair import UniformizationBFBOpt
 from bfb_optimization import BFBOpt
 from regular_simulation import RegularSimulation
+from restart_simulation import RestartSimulation
+from regenerative_simulation import RegenerativeSimulation
 from sector_fail_model import *
+from parallel_sim import run_blocks, new_seed
+from loss_pattern import num_patterns, is_sector_loss, format_pattern
+from is_tuning import FBProbTuner
+from checkpoint import Checkpoint, CheckpointWriter
 
 #
 # Imports for profiling
@@ -35,61 +41,128 @@ global profile
 profile = False
 
 class Simulate:
-    def __init__(self, code_desc, num_components, mission_time, is_type, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type=None, critical_region_check=False):
+    def __init__(self, code_desc, num_components, mission_time, is_type, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type=None, critical_region_check=False, sector_cmc=False):
         
         # Importance sampling type
         self.is_type = is_type
         
         if self.is_type == Simulation.IS_UNIF_BFB_NO_FORCING_OPT:
-            self.sim = UniformizationBFBOpt(code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check)
+            self.sim = UniformizationBFBOpt(code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check, sector_cmc)
             self.sim.init()
         elif self.is_type == Simulation.IS_BFB_NO_FORCING_OPT:
-            self.sim = BFBOpt(code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check)
+            self.sim = BFBOpt(code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check, sector_cmc)
             self.sim.init()
         elif self.is_type == Simulation.REGULAR:
-            self.sim = RegularSimulation(code_desc, num_components, mission_time, None, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check)
+            self.sim = RegularSimulation(code_desc, num_components, mission_time, None, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check, sector_cmc)
+            self.sim.init()
+        elif self.is_type == Simulation.RESTART:
+            self.sim = RestartSimulation(code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check, sector_cmc)
+            self.sim.init()
+        elif self.is_type == Simulation.REGENERATIVE:
+            self.sim = RegenerativeSimulation(code_desc, num_components, mission_time, None, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type,critical_region_check, sector_cmc)
             self.sim.init()
             
-    def run_simulation(self, num_iterations=10):
-        run_samples = []
-        run_patterns = []
+    ##
+    # Run num_iterations iterations in fixed-size blocks, possibly on 
+    # several worker processes (see parallel_sim).  With target_re or 
+    # max_time the run may stop early (see StoppingRule).
+    #
+    # With checkpoint_file the progress is kept in checkpoint (a
+    # Checkpoint, see checkpoint.py) and written there periodically.  A
+    # checkpoint that has been started is continued: its seed is used
+    # and num_iterations counts its iterations too.
+    #
+    # With tune_iterations (importance sampling only) fb_prob is first
+    # tuned on pilot runs of that many iterations (see is_tuning.py); 
+    # self.tuning is then (initial fb_prob, tuned fb_prob, estimated
+    # variance reduction).
+    #
+    def run_simulation(self, num_iterations=10, workers=1, seed=None, target_re=None, max_time=None,
+                       checkpoint=None, checkpoint_file=None, tune_iterations=None):
+        start = None
+        if checkpoint is not None and checkpoint.is_started():
+            seed = checkpoint.seed
+            start = (checkpoint.stats, checkpoint.next_block, checkpoint.iterations_run)
+
+        if seed is None:
+            seed = new_seed()
+        self.seed = seed
+
+        self.tuning = None
+        if tune_iterations is not None:
+            self.tuning = FBProbTuner(self.sim, tune_iterations).tune(seed)
+
+        bytes_per_sector = 512
+
+        done = None
+        if target_re is not None or max_time is not None:
+            done = StoppingRule(target_re, max_time)
+            if start is not None:
+                done.stats.merge(checkpoint.stats)
+                if done.reached():
+                    num_iterations = checkpoint.iterations_run
+
+        on_block = None
+        if checkpoint_file is not None:
+            if checkpoint is None:
+                checkpoint = Checkpoint()
+            checkpoint.seed = seed
+            on_block = CheckpointWriter(checkpoint, checkpoint_file)
+
+        (stats, self.iterations_run) = run_blocks(self, num_iterations, seed, workers, done=done,
+                                                  start=start, on_block=on_block)
+
+        if on_block is not None:
+            on_block.save()
+
+        pattern_counts = {}
+        pattern_probs = {}
+        for pattern in stats.get_patterns():
+            pattern_counts[format_pattern(pattern)] = int(stats.pattern_counts[pattern])
+            pattern_probs[format_pattern(pattern)] = stats.pattern_sums[pattern] / self.iterations_run
+
+        avg_bytes_lost = ((stats.loss_sum * bytes_per_sector)/ self.iterations_run)
+        return (stats, avg_bytes_lost, pattern_counts, pattern_probs)
+
+    ##
+    # Run one block of iterations, returning a SampleAccumulator
+    #
+    def run_block(self, num_iterations):
+        eras_code = self.sim.eras_code
+        (hits, misses) = (eras_code.check_cache_hits, eras_code.check_cache_misses)
+
+        stats = self.run_samples(num_iterations)
+
+        stats.cache_hits = eras_code.check_cache_hits - hits
+        stats.cache_misses = eras_code.check_cache_misses - misses
+        return stats
+
+    ##
+    # Run num_iterations iterations into a new SampleAccumulator
+    #
+    def run_samples(self, num_iterations):
+        stats = SampleAccumulator(num_patterns(self.sim.num_components))
         if self.sim.sector_failure_model is not None:
             num_sectors_per_disk = self.sim.sector_failure_model.total_num_sectors
         else:
             num_sectors_per_disk = 585937500
 
-            
-        bytes_per_sector = 512
-        avg_bytes_lost = 0
-        distinct_patterns = {}
-        pattern_probs = {}
-        
-        for i in range(num_iterations):
-            #print "Iteration: ", i
-            (sample, pattern, critical_region) = self.sim.run_iteration()
-            if not distinct_patterns.has_key(pattern):
-                distinct_patterns[pattern] = 0
-                pattern_probs[pattern] = 0
-            distinct_patterns[pattern] += 1
-            pattern_probs[pattern] += sample
-            
+        for (sample, pattern, critical_region) in self.sim.run_iterations(num_iterations):
+            bytes_lost = 0
             if sample != 0:
-                (num_disks, num_sectors) = eval(pattern)
-                if num_sectors == 0:
-                    avg_bytes_lost += (critical_region*sample)
+                if not is_sector_loss(pattern):
+                    bytes_lost = (critical_region*sample)
                 else:
-                    avg_bytes_lost += 1
-                    
-            run_samples.append(sample)
-            run_patterns.append(pattern)
-    
-        for pattern in pattern_probs.keys():
-            pattern_probs[pattern] /= num_iterations
-            
-        avg_bytes_lost = ((avg_bytes_lost * bytes_per_sector)/ num_iterations) 
-        return (run_samples, avg_bytes_lost, distinct_patterns, pattern_probs)
+                    # One sector per (weighted) sector loss
+                    bytes_lost = sample
+
+            stats.add(sample, pattern, bytes_lost)
+
+        return stats
 
 def test():
+    set_precision(PRECISION_MP)
+
     num_components = 8
     mission_time = 87600
     iterations = 1000
@@ -101,10 +174,8 @@ def test():
 
     simulation = Simulate("7_1_mds", num_components, mission_time, Simulation.REGULAR, ISParms(forcing_prob=0.8, fb_prob=0.3), sector_fail_model, component_fail_dists, component_repair_dists, ErasureCode.CHECK_FTV,critical_region_check=False)
 
-    (run_samples, avg_bytes_lost, distinct_patterns, pattern_probs) = simulation.run_simulation(iterations)
+    (samples, avg_bytes_lost, distinct_patterns, pattern_probs) = simulation.run_simulation(iterations)
 
-    samples = Samples(run_samples)
-        
     mean = samples.calcMean()
 
     (low_ci, high_ci) = samples.calcConfInterval("0.90")
@@ -5,7 +5,9 @@
 from erasure_code import *
 from smp_data_structures import *
 from state import *
+from loss_pattern import *
 import logging
+import math
 from mpmath import *
 from numpy import random
 
@@ -17,14 +19,24 @@ class ISParms:
         self.forcing_prob = forcing_prob
         self.fb_prob = fb_prob
 
+##
+# Just a container for importance splitting parameters
+#
+class SplittingParms:
+    def __init__(self, factors=None):
+        # factors[i-1] is the splitting factor on reaching i failed components
+        self.factors = factors
+
 class Simulation:
     REGULAR="regular"
     IS_UNIF_BFB_NO_FORCING_OPT = "uniformization_balanced_failure_biasing_without_forcing_with_optimization"
     IS_BFB_NO_FORCING_OPT = "balanced_failure_biasing_without_forcing_with_optimization"
+    RESTART = "restart"
+    REGENERATIVE = "regenerative"
     FAILURE="failure"
     REPAIR="repair"
     
-    def __init__(self,code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type=None, critical_region_check=True):
+    def __init__(self,code_desc, num_components, mission_time, is_parms, sector_fail_model, component_fail_dists, component_repair_dists, fail_check_type=None, critical_region_check=True, sector_cmc=False):
         
         # Load the erasure code to use within this simulation
         self.eras_code = ErasureCode(code_desc, fail_check_type)
@@ -41,15 +53,32 @@ class Simulation:
         self.component_fail_dists = component_fail_dists
         self.component_repair_dists = component_repair_dists
         
-        self.components = [Component(self.component_fail_dists[i], self.component_repair_dists[i]) for i in range(num_components)]
+        # Simulation time shared by all components
+        self.sim_clock = SimClock()
+
+        self.component_table = ComponentTable(self.component_fail_dists, self.component_repair_dists, self.sim_clock)
+        self.components = self.component_table.components
 
         self.component_repairs = None
         
         self.sector_failure_model = sector_fail_model
+
+        # Probability of a bad sector: a constant, or looked up by the age
+        # of the component for time dependent sector failure models
+        self.prob_bad_sector = None
+        if self.sector_failure_model is not None:
+            if self.sector_failure_model.time_dependent is True:
+                self.sector_failure_model.make_table(mission_time)
+            else:
+                self.prob_bad_sector = arith.real(self.sector_failure_model.prob_of_bad_sector())
         
         self.component_repairs = None
         
         self.critical_region_flg = critical_region_check
+
+        # Conditional Monte Carlo for sector failures (MDS codes only)
+        self.sector_cmc = sector_cmc and self.eras_code.type == ErasureCode.TYPE_MDS
+        self.reset_sector_cmc()
         
         
     ##
@@ -63,21 +92,213 @@ class Simulation:
     #
     def reset(self):
         return None 
+
+    ##
+    # Reset the likelihood ratio to 1.  With native floats the
+    # likelihood ratio is kept as a log so that long products of
+    # small factors do not underflow.
+    #
+    def reset_lr(self):
+        if arith.mode == PRECISION_FLOAT:
+            self.log_lr = 0.0
+        else:
+            self.lr = mpf(1)
+
+    ##
+    # Multiply the likelihood ratio by factor
+    #
+    def scale_lr(self, factor):
+        if arith.mode == PRECISION_FLOAT:
+            if factor > 0:
+                self.log_lr += math.log(factor)
+            else:
+                self.log_lr = float('-inf')
+        else:
+            self.lr *= factor
+
+    ##
+    # Get the current likelihood ratio
+    #
+    def get_lr(self):
+        if arith.mode == PRECISION_FLOAT:
+            return math.exp(self.log_lr)
+        return self.lr
     
     ##
     # Get the next event
     #  
     def get_next_event(self, curr_time):
         return None
+
+    ##
+    # Get the earliest pending repair among failed_comps, for simulators
+    # that schedule repairs (component_repairs is not None)
+    #
+    # @return (repair time, component id)
+    #
+    def get_next_repair(self, failed_comps):
+        return (None, None)
     
     ##
-    # Run an iteration of the simulator
+    # Conditional Monte Carlo for sector failures.  Instead of drawing the
+    # latent sector errors when min_disk_failures-1 disks are down, the 
+    # probability that they cause data loss is added to the sample and
+    # the iteration goes on as if they did not (weighted by the 
+    # probability of getting this far without a sector loss).
+    #
+    def reset_sector_cmc(self):
+        # Probability of no sector loss so far
+        self.sector_survival = arith.real(1)
+        # Expected (weighted) number of sector losses so far
+        self.sector_loss = arith.real(0)
+
+    def add_sector_loss(self, prob):
+        self.sector_loss += self.get_lr() * self.sector_survival * prob
+        self.sector_survival *= 1 - prob
+
+    ##
+    # Probability that component comp has a bad sector now
+    #
+    def get_prob_bad_sector(self, comp):
+        if self.prob_bad_sector is not None:
+            return self.prob_bad_sector
+        return self.sector_failure_model.prob_of_bad_sector(self.components[comp].clock)
+
+    ##
+    # Probability that a latent sector error in the critical region of
+    # one of the avail_components loses data, for an MDS code with 
+    # min_disk_failures-1 disks down (any such error loses data)
+    #
+    def get_sector_loss_prob(self, critical_region, avail_components):
+        num_sectors = self.sector_failure_model.total_num_sectors
+        # Sector indices are drawn from 0 .. num_sectors-2
+        in_region = min(max(math.ceil(critical_region), 0), num_sectors-1)
+        region_frac = arith.real(in_region) / (num_sectors-1)
+
+        if self.prob_bad_sector is not None:
+            return 1 - (1 - self.prob_bad_sector * region_frac)**len(avail_components)
+
+        prob_none = arith.real(1)
+        for comp in avail_components:
+            prob_none *= 1 - self.get_prob_bad_sector(comp) * region_frac
+        return 1 - prob_none
+
+    ##
+    # Build the result of an iteration from its data loss (pattern, 
+    # critical_region), or None, and the expected sector losses of the
+    # conditional Monte Carlo mode
+    #
+    # @return (sample, pattern, critical_region)
     #
+    def get_iteration_result(self, loss):
+        if self.sector_loss == 0:
+            if loss is None:
+                return (0, NO_LOSS, 0)
+            return (self.get_lr(), loss[0], loss[1])
+
+        if loss is None:
+            return (self.sector_loss, encode_pattern(self.eras_code.min_disk_failures-1, 1), 1)
+
+        # A whole-disk loss; sector losses count one sector each
+        disk_loss = self.get_lr() * self.sector_survival
+        sample = disk_loss + self.sector_loss
+        return (sample, loss[0], (disk_loss * loss[1] + self.sector_loss) / sample)
+
+    ##
+    # Whether the failed components lose data: read from the state's
+    # decoder if it tracks the code, checked with the code otherwise
+    #
+    def is_disk_failure(self, failed_comps):
+        if self.state.decoder is not None:
+            return self.state.is_data_lost()
+        return self.eras_code.is_failure(failed_comps)
+
+    ##
+    # Check for data loss after a component failure at curr_time
+    #
+    # @return (pattern, critical_region) on data loss, None otherwise
+    #
+    def get_data_loss(self, curr_time):
+        # Check to see if #erasures  >= minimum disk fault tolerance of erasure code
+        if self.eras_code.min_disk_failures <= self.state.get_num_component_fail():
+
+            failed_comps = self.state.get_failed_components()
+            critical_region = 0
+            
+            logging.debug("Components failed : %s" % failed_comps)
+
+            # Check to see if we are in the "failed" state
+            if self.is_disk_failure(failed_comps) is True:
+                if self.component_repairs is None and self.critical_region_flg is True:
+                    critical_region = (arith.real(1) / (1 << (self.state.get_num_component_fail()-1))) * self.sector_failure_model.total_num_sectors
+                    #None
+                elif self.component_repairs is not None and self.critical_region_flg is True:
+                    (next_repair, next_repair_idx) = self.get_next_repair(failed_comps)
+                    
+                    if self.critical_region_flg is True and self.sector_failure_model is not None:
+                        critical_region = ((next_repair - curr_time) / (next_repair - self.component_repair_start[next_repair_idx])) * self.sector_failure_model.total_num_sectors
+                    else:
+                        critical_region = 0
+                    
+                return (encode_pattern(self.state.get_num_component_fail(), 0), critical_region)
+        
+        # Put check in to see if #erasures == HD-1 and see if there are any sector failures
+        if (self.eras_code.min_disk_failures-1) <= self.state.get_num_component_fail():
+            if self.sector_failure_model is not None:
+                failed_comps = self.state.get_failed_components()
+                
+                # Compute the critical region 
+                if self.critical_region_flg is True and self.component_repairs is None:
+                    max_time = self.components[failed_comps[0]].repair_clock
+                    max_idx = failed_comps[0]
+                    for i in failed_comps[1:]:
+                        if self.components[i].repair_clock > max_time:
+                            max_time = self.components[i].repair_clock
+                            max_idx = i
+                    critical_region = (arith.real(1) / (1 << (self.state.get_num_component_fail()-1))) * self.sector_failure_model.total_num_sectors 
+                  
+                elif self.critical_region_flg is True and self.component_repairs is not None:
+                    (next_repair, next_repair_idx) = self.get_next_repair(failed_comps)
+                            
+                    critical_region = ((next_repair - curr_time) / (next_repair - self.component_repair_start[next_repair_idx])) * self.sector_failure_model.total_num_sectors
+                else:
+                    critical_region = self.sector_failure_model.total_num_sectors-1
+                
+                # Check to see if there is a sector failure on any disk
+                # For each sector failure, check for data loss
+                avail_components = self.state.get_avail_components()
+
+                if self.sector_cmc is True:
+                    self.add_sector_loss(self.get_sector_loss_prob(critical_region, avail_components))
+                    return None
+
+                sector_failures = [[] for i in range(self.num_components)]
+            
+                for comp in avail_components:
+                    draw = random.uniform()
+                    if draw < self.get_prob_bad_sector(comp):
+                        sector_index = random.randint(0, self.sector_failure_model.total_num_sectors-1)
+                        if sector_index < critical_region:
+                            sector_failures[comp].append(sector_index)
+            
+                if self.eras_code.is_failure(failed_comps, sector_failures, self.state.decoder) is True:
+                    return (encode_pattern(self.state.get_num_component_fail(), 1), critical_region)
+
+        return None
+
+    ##
+    # Yield (sample, pattern, critical_region) for num_iterations iterations
+    #
+    def run_iterations(self, num_iterations):
+        for i in range(num_iterations):
+            yield self.run_iteration()
+
     ##
     # Run an iteration of the simulator
     #
     def run_iteration(self):
         self.reset()
+        self.reset_sector_cmc()
         curr_time = 0 
         
         while 1:
@@ -89,8 +310,7 @@ class Simulation:
                 break
             
             # Update all component clocks
-            for component in self.components:
-                component.update_clock(event_time)
+            self.sim_clock.update(event_time)
 
             if event_type is not None:
                 logging.debug("TIME %s, EVT TYPE: %s, COMP ID: %s, CURR COMP FAILED: %s\n" % (event_time, event_type, component_id, self.state.get_num_component_fail()))
@@ -102,76 +322,9 @@ class Simulation:
             if event_type is None or event_type == Component.EVENT_COMP_REPAIR:
                 continue
             
-            # Check to see if #erasures  >= minimum disk fault tolerance of erasure code
-            if self.eras_code.min_disk_failures <= self.state.get_num_component_fail():
-
-                failed_comps = self.state.get_failed_components()
-                critical_region = 0
-                
-                logging.debug("Components failed : %s" % failed_comps)
-
-                # Check to see if we are in the "failed" state
-                if self.eras_code.is_failure(failed_comps) is True:
-                    logging.debug("LR : %e" % self.lr)
-                    if self.component_repairs is None and self.critical_region_flg is True:
-                        critical_region = (mpf(1) / (1 << (self.state.get_num_component_fail()-1))) * self.sector_failure_model.total_num_sectors
-                        #None
-                    elif self.component_repairs is not None and self.critical_region_flg is True:
-                        next_repair = self.component_repairs[failed_comps[0]]
-                        next_repair_idx = failed_comps[0]
-                        for i in failed_comps[1:]:
-                            if next_repair > self.component_repairs[i]:
-                                next_repair = self.component_repairs[i]
-                                next_repair_idx = i
-                        
-                        if self.critical_region_flg is True and self.sector_failure_model is not None:
-                            critical_region = ((next_repair - curr_time) / (next_repair - self.component_repair_start[next_repair_idx])) * self.sector_failure_model.total_num_sectors
-                        else:
-                            critical_region = 0
-                        
-                    return (self.lr, "(%d, %d)" % (self.state.get_num_component_fail(), 0), critical_region)
-            
-            # Put check in to see if #erasures == HD-1 and see if there are any sector failures
-            if (self.eras_code.min_disk_failures-1) <= self.state.get_num_component_fail():
-                if self.sector_failure_model is not None:
-                    failed_comps = self.state.get_failed_components()
-                    
-                    # Compute the critical region 
-                    if self.critical_region_flg is True and self.component_repairs is None:
-                        max_time = self.components[failed_comps[0]].repair_clock
-                        max_idx = failed_comps[0]
-                        for i in failed_comps[1:]:
-                            if self.components[i].repair_clock > max_time:
-                                max_time = self.components[i].repair_clock
-                                max_idx = i
-                        critical_region = (mpf(1) / (1 << (self.state.get_num_component_fail()-1))) * self.sector_failure_model.total_num_sectors 
-                      
-                    elif self.critical_region_flg is True and self.component_repairs is not None:
-                        next_repair = self.component_repairs[failed_comps[0]]
-                        next_repair_idx = failed_comps[0]
-                        for i in failed_comps[1:]:
-                            if next_repair > self.component_repairs[i]:
-                                next_repair = self.component_repairs[i]
-                                next_repair_idx = i
-                                
-                        critical_region = ((next_repair - curr_time) / (next_repair - self.component_repair_start[next_repair_idx])) * self.sector_failure_model.total_num_sectors
-                    else:
-                        critical_region = self.sector_failure_model.total_num_sectors-1
-                    
-                    # Check to see if there is a sector failure on any disk
-                    # For each sector failure, check for data loss
-                    avail_components = self.state.get_avail_components()
-                    sector_failures = [[] for i in range(self.num_components)]
-                
-                    for comp in avail_components:
-                        draw = random.uniform()
-                        if draw < self.sector_failure_model.prob_of_bad_sector():
-                            sector_index = random.randint(0, self.sector_failure_model.total_num_sectors-1)
-                            if sector_index < critical_region:
-                                sector_failures[comp].append(sector_index)
-                
-                    if self.eras_code.is_failure(failed_comps, sector_failures) is True:
-                        logging.debug("LR : %e" % self.lr)
-                        return (self.lr, "(%d, %d)" % (self.state.get_num_component_fail(), 1), critical_region)
+            loss = self.get_data_loss(curr_time)
+            if loss is not None:
+                logging.debug("LR : %e" % self.get_lr())
+                return self.get_iteration_result(loss)
 
-        return (0, "(0, 0)", 0)
+        return self.get_iteration_result(None)
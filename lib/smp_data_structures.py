@@ -9,18 +9,53 @@
 #
 #
 
+import math
+import numpy
 import mpmath
 from mpmath import mpf
-from mpmath import ln
 from mpmath import findroot
 import random
 
 
 ##
-# Set precision used by the MP math lib
+# Arithmetic used in the simulation hot loop.  PRECISION_MP uses the
+# MP math lib, PRECISION_FLOAT uses native floats.  The mode is global
+# and must be selected (via set_precision) before any distribution or
+# simulator is constructed.
 #
-mpmath.mp.prec += 100
-mpmath.mp.dps = 100
+PRECISION_MP = "mp"
+PRECISION_FLOAT = "float"
+
+class Arithmetic:
+    def __init__(self):
+        self.mode = PRECISION_MP
+        self.real = mpf
+        self.exp = mpmath.exp
+        self.ln = mpmath.ln
+        self.power = mpmath.power
+
+    def set_mode(self, mode):
+        self.mode = mode
+        if mode == PRECISION_FLOAT:
+            self.real = float
+            self.exp = math.exp
+            self.ln = math.log
+            self.power = math.pow
+        else:
+            # Set precision used by the MP math lib
+            mpmath.mp.dps = 100
+            self.real = mpf
+            self.exp = mpmath.exp
+            self.ln = mpmath.ln
+            self.power = mpmath.power
+
+arith = Arithmetic()
+
+##
+# Select the arithmetic (PRECISION_MP or PRECISION_FLOAT)
+#
+def set_precision(mode):
+    arith.set_mode(mode)
 
 ##
 # Contains parameters, distribution functions and hazard rate function
@@ -33,9 +68,9 @@ class Weibull:
     # Note: when shape == 1, this is an Exponential distribution
     #
     def __init__(self, shape=1, scale=1, location=0):
-        self.shape = mpf(shape)
-        self.scale = mpf(scale)
-        self.location = mpf(location)
+        self.shape = arith.real(shape)
+        self.scale = arith.real(scale)
+        self.location = arith.real(location)
 
     ##
     # Get the probability density of Weibull(shape, scale, location) at x 
@@ -49,11 +84,11 @@ class Weibull:
         elif x < self.location:
             return 0
         else:
-            x = mpf(x)
+            x = arith.real(x)
             a = self.shape/self.scale
             b = (x-self.location)/self.scale
-            b = mpmath.power(b, self.shape-1)
-            c = mpmath.exp(-mpmath.power(((x-self.location)/self.scale), self.shape))
+            b = arith.power(b, self.shape-1)
+            c = arith.exp(-arith.power(((x-self.location)/self.scale), self.shape))
 
             return a * b *c
     ##
@@ -67,12 +102,12 @@ class Weibull:
     # @return: probability of failure before or at x
     #
     def cdf_eval(self, x):
-        x = mpf(x)
+        x = arith.real(x)
 
         if x < self.location:
             return 0
 
-        return mpf(1) - mpmath.exp(-mpmath.power(((x-self.location)/self.scale), self.shape))
+        return 1 - arith.exp(-arith.power(((x-self.location)/self.scale), self.shape))
 
     ##
     # Return the hazard rate at x.  The hazard rate is interpreted 
@@ -80,6 +115,9 @@ class Weibull:
     #
     # Note: If shape == 1, then this value will be constant for all x
     #
+    # The closed form h(x) = (shape/scale) * ((x-location)/scale)^(shape-1)
+    # is used rather than pdf/(1-cdf), which cancels badly with floats.
+    #
     # @param x: variable, most likely a time
     # @return instantaneous failure rate at x 
     #
@@ -87,9 +125,9 @@ class Weibull:
         if x < self.location:
             return 0
         elif self.shape == 1:
-            return mpf(1) / self.scale
+            return 1 / self.scale
         else:
-            return abs(self.pdf_eval(x) / (mpf(1) - self.cdf_eval(x)))
+            return (self.shape/self.scale) * arith.power((x-self.location)/self.scale, self.shape-1)
             
     ##
     # When the shape parameter is not 1, then the hazard rate will
@@ -105,16 +143,16 @@ class Weibull:
     #
     #
     def get_max_hazard_rate(self, mission_time):
-        max = mpf(0)
+        max = arith.real(0)
 
         if self.shape == 1:
-            return mpf(1) / self.scale
+            return 1 / self.scale
 
-        for i in range(1, mission_time, int(0.1 * mission_time)):
+        for i in range(1, int(mission_time), int(0.1 * mission_time)):
             curr_h_rate = self.hazard_rate(i)
             if curr_h_rate > max:
                 max = curr_h_rate
-            elif curr_h_rate == mpf('nan'):
+            elif curr_h_rate != curr_h_rate:
                 break
     
         return max
@@ -123,16 +161,16 @@ class Weibull:
     # Get min hazard rate
     #    
     def get_min_hazard_rate(self, mission_time):
-        min = mpf(1)
+        min = arith.real(1)
 
         if self.shape == 1:
-            return mpf(1) / self.scale
+            return 1 / self.scale
 
-        for i in range(0, mission_time, int(0.1 * mission_time)):
+        for i in range(0, int(mission_time), int(0.1 * mission_time)):
             curr_h_rate = self.hazard_rate(i)
             if curr_h_rate < min:
                 max = curr_h_rate
-            elif curr_h_rate == mpf('nan'):
+            elif curr_h_rate != curr_h_rate:
                 break
     
         return min
@@ -152,9 +190,22 @@ class Weibull:
         while val <= lower:
             print "%.2f %.2f" % (lower, val)
             val = self.draw()
-            
+
         return val
-    
+
+    ##
+    # Draw the time remaining until the event, given that it has not
+    # happened by 'age' (time since the start of the distribution)
+    #
+    def draw_residual(self, age):
+        U = random.uniform(0,1)
+        while U == 0:
+            U = random.uniform(0,1)
+        excess = max(age - self.location, 0)
+        draw = self.location + self.scale*((excess/self.scale)**self.shape - arith.ln(U))**(arith.real(1)/self.shape) - age
+
+        return arith.real(draw)
+
     ##
     # Draw using the inverse transform method. 
     # This method draws from the waiting time 
@@ -165,10 +216,177 @@ class Weibull:
         U = random.uniform(0,1)
         while U == 0:
             U = random.uniform(0,1)
-        draw = ((-(self.scale**self.shape)*ln(U)+((curr_time)**self.shape))**(1/self.shape) - (curr_time))
+        draw = ((-(self.scale**self.shape)*arith.ln(U)+((curr_time)**self.shape))**(1/self.shape) - (curr_time))
         
         return abs(draw)
             
+##
+# Simulation time shared by all components of a simulator.  Component
+# clocks are derived from it on demand, so moving the simulation
+# forward is O(1) no matter how many components there are.
+#
+class SimClock:
+    def __init__(self):
+        self.now = arith.real(0)
+
+    def update(self, curr_time):
+        self.now = curr_time
+
+##
+# Structure-of-arrays store of the components of a simulator: state 
+# (uint8), time of the last renewal (begin_time) and of the last failure
+# (repair_start) of every component, and the parameters of their 
+# failure and repair distributions, one entry per group of identical 
+# distributions.  Times are float64 with native floats and mpf objects
+# otherwise.
+#
+# The Component objects of a table (components) are views of one row.
+# Code that works on all components at once (resets, snapshots, total
+# hazard rates) uses the arrays directly.
+#
+class ComponentTable(object):
+
+    ##
+    # Below this many components, array operations cost more than they 
+    # save and the total hazard rates are summed component by component
+    #
+    VECTOR_MIN_COMPONENTS = 32
+
+    def __init__(self, component_fail_distrs, component_repair_distrs, sim_clock=None):
+        num_components = len(component_fail_distrs)
+
+        if sim_clock is None:
+            sim_clock = SimClock()
+        self.sim_clock = sim_clock
+
+        self.state = numpy.zeros(num_components, dtype=numpy.uint8)
+        self.state.fill(Component.STATE_OK)
+
+        if arith.mode == PRECISION_FLOAT:
+            time_type = float
+        else:
+            time_type = object
+        self.begin_time = numpy.empty(num_components, dtype=time_type)
+        self.begin_time.fill(arith.real(0))
+        self.repair_start = numpy.empty(num_components, dtype=time_type)
+        self.repair_start.fill(arith.real(0))
+
+        (self.fail_group, self.fail_shape, self.fail_scale, self.fail_location) = group_distributions(component_fail_distrs)
+        (self.repair_group, self.repair_shape, self.repair_scale, self.repair_location) = group_distributions(component_repair_distrs)
+
+        self.components = [Component(component_fail_distrs[i], component_repair_distrs[i], sim_clock, self, i) for i in range(num_components)]
+
+    def __len__(self):
+        return len(self.state)
+
+    ##
+    # Set all components to OK, renewed at curr_time
+    #
+    def reset(self, curr_time=0):
+        self.sim_clock.update(curr_time)
+        self.state.fill(Component.STATE_OK)
+        self.begin_time.fill(curr_time)
+        self.repair_start.fill(arith.real(0))
+
+    ##
+    # Copy of the component state and clocks, for restore()
+    #
+    def save(self):
+        return (self.state.copy(), self.begin_time.copy(), self.repair_start.copy())
+
+    def restore(self, saved):
+        (state, begin_time, repair_start) = saved
+        self.state[:] = state
+        self.begin_time[:] = begin_time
+        self.repair_start[:] = repair_start
+
+    ##
+    # Sum of the failure hazard rates of the available components (the
+    # sum of curr_component_fail_rate() over all components)
+    #
+    def total_fail_rate(self):
+        if arith.mode != PRECISION_FLOAT or len(self) < self.VECTOR_MIN_COMPONENTS:
+            return self.sum_fail_rates()
+
+        avail = self.state == Component.STATE_OK
+        group = self.fail_group[avail]
+        ages = self.sim_clock.now - self.begin_time[avail]
+        return float(weibull_hazard_rates(ages, self.fail_shape[group], self.fail_scale[group], self.fail_location[group]).sum())
+
+    ##
+    # Sum of the repair hazard rates of the failed components (the
+    # sum of curr_component_repair_rate() over all components)
+    #
+    def total_repair_rate(self):
+        if arith.mode != PRECISION_FLOAT or len(self) < self.VECTOR_MIN_COMPONENTS:
+            return self.sum_repair_rates()
+
+        failed = self.state == Component.STATE_FAILED
+        group = self.repair_group[failed]
+        ages = numpy.maximum(self.sim_clock.now - self.repair_start[failed], 0)
+        return float(weibull_hazard_rates(ages, self.repair_shape[group], self.repair_scale[group], self.repair_location[group]).sum())
+
+    ##
+    # total_fail_rate and total_repair_rate one component at a time (as
+    # curr_component_fail_rate and curr_component_repair_rate)
+    #
+    def sum_fail_rates(self):
+        now = self.sim_clock.now
+        states = self.state.tolist()
+        begin_times = self.begin_time.tolist()
+
+        total = arith.real(0)
+        for i in range(len(states)):
+            if states[i] == Component.STATE_OK:
+                total += self.components[i].component_fail_distr.hazard_rate(now - begin_times[i])
+        return total
+
+    def sum_repair_rates(self):
+        now = self.sim_clock.now
+        states = self.state.tolist()
+        repair_starts = self.repair_start.tolist()
+
+        total = arith.real(0)
+        for i in range(len(states)):
+            if states[i] == Component.STATE_FAILED:
+                if now > repair_starts[i]:
+                    total += self.components[i].component_repair_distr.hazard_rate(now - repair_starts[i])
+                else:
+                    total += self.components[i].component_repair_distr.hazard_rate(arith.real(0))
+        return total
+
+##
+# Group identical Weibull distributions
+#
+# @return (group of each distribution, shape, scale and location of 
+#          each group as float64 arrays)
+#
+def group_distributions(distrs):
+    groups = {}
+    group = numpy.zeros(len(distrs), dtype=int)
+    params = []
+    for i in range(len(distrs)):
+        key = (float(distrs[i].shape), float(distrs[i].scale), float(distrs[i].location))
+        if not groups.has_key(key):
+            groups[key] = len(params)
+            params.append(key)
+        group[i] = groups[key]
+
+    shape = numpy.array([param[0] for param in params], dtype=float)
+    scale = numpy.array([param[1] for param in params], dtype=float)
+    location = numpy.array([param[2] for param in params], dtype=float)
+    return (group, shape, scale, location)
+
+##
+# Weibull.hazard_rate of arrays of ages and parameters (native floats)
+#
+def weibull_hazard_rates(ages, shape, scale, location):
+    excess = ages - location
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        rates = (shape/scale) * numpy.power(numpy.maximum(excess, 0)/scale, shape-1)
+    rates = numpy.where(shape == 1, 1/scale, rates)
+    return numpy.where(excess < 0, 0, rates)
+
 ##
 # This class encapsulates the state of a component under simulation.
 # Each component is given failure and repair distributions for 
@@ -177,14 +395,20 @@ class Weibull:
 # A component may be in one of two states: OK (operational, no failures) or
 # FAILED (entire component is failed). 
 #
+# A component only stores the times at which it was last renewed 
+# (begin_time) and last failed (repair_start).  Its clocks are computed
+# from the (shared) simulation clock when they are read.  Both times and
+# the state are kept in a row of a ComponentTable.
 #
-class Component:
+class Component(object):
+
+    __slots__ = ("sim_clock", "table", "index", "component_fail_distr", "component_repair_distr")
 
     ##
-    # The three possible states
+    # The two possible states
     #
-    STATE_OK = "state ok"
-    STATE_FAILED = "state failed"
+    STATE_OK = 0
+    STATE_FAILED = 1
 
     ##
     # Possible failure events
@@ -195,34 +419,85 @@ class Component:
     ##
     # A component is constructed by specifying the appropriate failure/repair distributions.
     #
-    # The component fail/repair distributions must be specified.
+    # The component fail/repair distributions must be specified.  Components
+    # of one simulator share its sim_clock and are rows (index) of its
+    # ComponentTable; a private clock and table are used if none is given.
     #
     # This function will set the component state to OK and set all clocks to 0.
     # 
     # init_clock *must* first be called in order to use this object in simulation.
     #
-    def __init__(self, component_fail_distr, component_repair_distr):
-        # Current state 
-        self.state = self.STATE_OK
+    def __init__(self, component_fail_distr, component_repair_distr, sim_clock=None, table=None, index=0):
+        # "Global" simulation clock
+        if sim_clock is None:
+            sim_clock = SimClock()
+        self.sim_clock = sim_clock
+
+        # Failure and repair distributions
+        self.component_fail_distr = component_fail_distr
+        self.component_repair_distr = component_repair_distr
 
-        # Last "global" clock update
-        self.last_time_update = mpf(0)
+        # Row of the table holding the state and clocks
+        if table is None:
+            table = ComponentTable([component_fail_distr], [component_repair_distr], sim_clock)
+        self.table = table
+        self.index = index
 
-        # Global begin time of this component
-        self.begin_time = mpf(0)
+    ##
+    # Current state
+    #
+    @property
+    def state(self):
+        return self.table.state.item(self.index)
 
-        # Local repair time of this component
-        self.repair_clock = mpf(0)
+    @state.setter
+    def state(self, state):
+        self.table.state[self.index] = state
 
-        # Local (relative) clock of this component
-        self.clock = mpf(0)
-        
-        self.repair_start = mpf(0)
+    ##
+    # Global begin time of this component
+    #
+    @property
+    def begin_time(self):
+        return self.table.begin_time.item(self.index)
 
-        # Failure and repair distributions
-        self.component_fail_distr = component_fail_distr
-        self.component_repair_distr = component_repair_distr
+    @begin_time.setter
+    def begin_time(self, begin_time):
+        self.table.begin_time[self.index] = begin_time
+
+    ##
+    # Global time of the last failure of this component
+    #
+    @property
+    def repair_start(self):
+        return self.table.repair_start.item(self.index)
+
+    @repair_start.setter
+    def repair_start(self, repair_start):
+        self.table.repair_start[self.index] = repair_start
         
+    ##
+    # Last "global" clock update
+    #
+    @property
+    def last_time_update(self):
+        return self.sim_clock.now
+
+    ##
+    # Local (relative) clock of this component
+    #
+    @property
+    def clock(self):
+        return self.sim_clock.now - self.begin_time
+
+    ##
+    # Local repair time of this component
+    #
+    @property
+    def repair_clock(self):
+        if self.state == self.STATE_FAILED and self.sim_clock.now > self.repair_start:
+            return self.sim_clock.now - self.repair_start
+        return arith.real(0)
 
     ##
     # Set the last clock update to the current simulation time and initialize 
@@ -231,11 +506,9 @@ class Component:
     # @param curr_time: t_0 of this component
     #
     def init_clock(self, curr_time):
-        self.last_time_update = curr_time
+        self.sim_clock.update(curr_time)
         self.begin_time = curr_time
-        self.clock = mpf(0)
-        self.repair_clock = mpf(0)
-        self.repair_start = mpf(0)
+        self.repair_start = arith.real(0)
 
     ##
     # Set the state of this component to OK
@@ -244,24 +517,16 @@ class Component:
         self.state = self.STATE_OK
 
     ##
-    # Update component clocks.  There are three main clocks to update:
-    # the component clock, the repair clock (if there is an ongoing repair)
-    # and the time of the last clock update (used to update the component clock)
-    #
-    # The clock member variable is used to get instantaneous failure 
-    # rate, while the repair clock is used to get the instantaneous "repair" rate.
+    # Update component clocks.  The component clock is used to get the 
+    # instantaneous failure rate, while the repair clock is used to get 
+    # the instantaneous "repair" rate.  Both are derived from the 
+    # simulation clock, so this only moves the (shared) simulation clock.
     #
     # @param curr_time: current simulation time
     #
     def update_clock(self, curr_time):
-        self.clock += (curr_time - self.last_time_update)
-        if self.state == self.STATE_FAILED:
-            self.repair_clock = (curr_time - self.repair_start)
-        else:
-            self.repair_clock = mpf(0)
+        self.sim_clock.update(curr_time)
 
-        
-        self.last_time_update = curr_time
     ##
     # Get this component's current time    
     #
@@ -291,16 +556,13 @@ class Component:
     #
     def fail_component(self, curr_time):
         self.state = self.STATE_FAILED
-        self.repair_clock = mpf(0)
         self.repair_start = curr_time
     
     ##
     # Repair this component.  
     #
     def repair_component(self):
-        self.begin_time = self.last_time_update
-        self.clock = mpf(0)
-        self.repair_clock = mpf(0)
+        self.begin_time = self.sim_clock.now
         self.state = self.STATE_OK
     
     ##
@@ -310,7 +572,7 @@ class Component:
     #
     def curr_component_fail_rate(self):
         if self.state == self.STATE_FAILED:
-            return mpf(0)
+            return arith.real(0)
 
         return self.component_fail_distr.hazard_rate(self.clock)
 
@@ -321,7 +583,7 @@ class Component:
     #
     def curr_component_repair_rate(self):
         if self.state == self.STATE_OK:
-            return mpf(0)
+            return arith.real(0)
         
         return self.component_repair_distr.hazard_rate(self.repair_clock)
 
@@ -375,7 +637,7 @@ class InverseTransformHomogeneousFailRepairRates:
             wait_time = findroot(self.func, [0,100], solver='secant', maxsteps=1000)
             #wait_time = findroot(self.func, [0, 87600] , maxsteps=1000, solver='secant', verify=False)
             
-        return abs(wait_time)
+        return arith.real(abs(wait_time))
     
     def get_clock_value(self, clock, location):
         if clock - location < 0:
@@ -385,7 +647,7 @@ class InverseTransformHomogeneousFailRepairRates:
     
     def func(self, x):
     	
-        lhs_const = -ln(self.curr_uniform_variate)
+        lhs_const = -arith.ln(self.curr_uniform_variate)
         
         for a in self.curr_avail_devices:
             lhs_const += ((self.get_clock_value(self.components[a].read_clock(),self.components[a].component_fail_distr.location) ** self.fail_shape) / -self.fail_scale_to_shape)
@@ -402,9 +664,151 @@ class InverseTransformHomogeneousFailRepairRates:
         
         return rhs_var-lhs_const
 
+##
+# Skip-ahead sampler for the all-healthy state: draws the time until
+# the first failure among a set of available components and the
+# component that fails, using one variate instead of one per component.
+#
+# Like draw_inverse_transform, waiting times are measured from the
+# current clock reading (age) of each component.
+#
+# For identical components the time to first failure has a closed form
+# when the hazard rate is constant (shape == 1) or all components have
+# the same age.  Otherwise the components are grouped by age (components
+# renewed at the same time share an age) and the total cumulative hazard
+# is inverted with a safeguarded Newton iteration.  Components with
+# different failure distributions fall back to one draw per component.
+#
+class FirstFailureSampler:
+
+    def __init__(self, components):
+        self.components = components
+
+        dist = self.components[0].component_fail_distr
+        self.shape = dist.shape
+        self.scale = dist.scale
+        self.scale_to_shape = self.scale**self.shape
+
+        # Are all failure distributions the same?
+        self.identical = True
+        for comp in self.components:
+            other = comp.component_fail_distr
+            if other.shape != dist.shape or other.scale != dist.scale or other.location != dist.location:
+                self.identical = False
+                break
+
+    ##
+    # Draw a unit exponential variate
+    #
+    def draw_exponential(self):
+        U = random.uniform(0,1)
+        while U == 0:
+            U = random.uniform(0,1)
+        return -arith.ln(U)
+
+    ##
+    # Draw the time until the first of num_comps identical components, 
+    # all of age 'age', fails
+    #
+    def draw_min_residual(self, num_comps, age):
+        E = self.draw_exponential()
+        if self.shape == 1:
+            return (self.scale * E) / num_comps
+        return ((self.scale_to_shape * E) / num_comps + age**self.shape)**(1/self.shape) - age
+
+    ##
+    # Draw the next failure among avail_comps
+    #
+    # @return (time until the failure, failed component id)
+    #
+    def draw(self, avail_comps):
+        if self.identical is False:
+            return self.draw_each(avail_comps)
+
+        groups = {}
+        for comp in avail_comps:
+            age = self.components[comp].read_clock()
+            if not groups.has_key(age):
+                groups[age] = []
+            groups[age].append(comp)
+
+        if self.shape == 1 or len(groups) == 1:
+            age = groups.keys()[0]
+            wait_time = self.draw_min_residual(len(avail_comps), age)
+            return (wait_time, avail_comps[random.randint(0, len(avail_comps)-1)])
+
+        ages = groups.keys()
+        counts = [len(groups[age]) for age in ages]
+        wait_time = self.solve(ages, counts, self.scale_to_shape * self.draw_exponential())
+
+        # The failed component is picked proportionally to its hazard rate
+        weights = [counts[i] * (ages[i]+wait_time)**(self.shape-1) for i in range(len(ages))]
+        draw = random.uniform(0,1) * sum(weights)
+        idx = 0
+        while idx < len(ages)-1 and draw >= weights[idx]:
+            draw -= weights[idx]
+            idx += 1
+        group = groups[ages[idx]]
+
+        return (wait_time, group[random.randint(0, len(group)-1)])
+
+    ##
+    # Solve sum_g counts[g]*((ages[g]+x)^shape - ages[g]^shape) = target for x
+    #
+    def solve(self, ages, counts, target):
+        k = self.shape
+        num_comps = sum(counts)
+        base = sum([counts[i] * ages[i]**k for i in range(len(ages))])
+
+        # Upper bound: all components at the age that accumulates hazard slowest
+        if k > 1:
+            age = min(ages)
+        else:
+            age = max(ages)
+        hi = (target / num_comps + age**k)**(1/k) - age
+        lo = 0 * hi
+        x = hi
+
+        for i in range(200):
+            f = sum([counts[j] * (ages[j]+x)**k for j in range(len(ages))]) - base - target
+            if f > 0:
+                hi = x
+            else:
+                lo = x
+
+            df = k * sum([counts[j] * (ages[j]+x)**(k-1) for j in range(len(ages))])
+            next_x = None
+            if df > 0 and df != float('inf'):
+                next_x = x - f/df
+            if next_x is None or next_x <= lo or next_x >= hi:
+                next_x = (lo + hi) / 2
+
+            if abs(next_x - x) <= 1e-15 * next_x:
+                return next_x
+            x = next_x
+
+        return x
+
+    ##
+    # Exact fallback: one draw per component
+    #
+    def draw_each(self, avail_comps):
+        next_comp = avail_comps[0]
+        next_time = self.components[next_comp].component_fail_distr.draw_inverse_transform(self.components[next_comp].read_clock())
+
+        for comp in avail_comps[1:]:
+            time = self.components[comp].component_fail_distr.draw_inverse_transform(self.components[comp].read_clock())
+            if time < next_time:
+                next_time = time
+                next_comp = comp
+
+        return (next_time, next_comp)
+
         
 
 def test():
+    set_precision(PRECISION_MP)
+
     # Basic test of the Weibull functions
     w = Weibull(shape=mpf(2.0), scale=mpf(12), location=6)
 
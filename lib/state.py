@@ -1,5 +1,6 @@
 from bm_ops import *
 from smp_data_structures import Component
+from bisect import bisect_left, insort
 import logging
 ##
 # This module is used to store and process state information
@@ -24,10 +25,36 @@ class State:
 	##
 	#  Given a list of component IDs construct the data 
 	#  structures needed to capture system state.
+	#
+	#  The failed and available components are kept as sorted lists,
+	#  updated on every transition, with a flag per component for 
+	#  membership tests.  The bitmaps are kept alongside.
+	#
+	#  If a decoder (a DecoderState, see decoder_state.py) is given, 
+	#  it follows the component failures and repairs, so that whole-
+	#  disk data loss can be read from it at any time.
 	#  
-	def __init__(self, components=[]):
+	def __init__(self, components=[], decoder=None):
 		self.num_components = len(components)
 		self.components = components
+		self.decoder = decoder
+
+		# Failed flag, sorted list of failed and of available component IDs
+		self.failed_flags = [False for i in range(self.num_components)]
+		self.failed_list = []
+		self.avail_list = range(self.num_components)
+
+		self.reset()
+
+	##
+	# Set all components back to available.  The lists are emptied 
+	# and refilled in place.
+	#
+	def reset(self):
+		for component_id in self.failed_list:
+			self.failed_flags[component_id] = False
+		del self.failed_list[:]
+		self.avail_list[:] = range(self.num_components)
 
 		# Keep track of number of component failures
 		self.num_failed_comp = 0
@@ -40,6 +67,9 @@ class State:
 
 		# System state
 		self.sys_state = self.CURR_STATE_OK
+
+		if self.decoder is not None:
+			self.decoder.reset()
 	
 	##
 	# Function to copy another State Obj
@@ -47,10 +77,17 @@ class State:
 	def copy(self, state):
 		self.num_components = state.num_components
 		self.components = state.components[:]
+		self.failed_flags = state.failed_flags[:]
+		self.failed_list = state.failed_list[:]
+		self.avail_list = state.avail_list[:]
 		self.num_failed_comp = state.num_failed_comp
 		self.failed_comp = state.failed_comp
 		self.avail_comp = state.avail_comp
 		self.sys_state = state.sys_state
+		if state.decoder is not None:
+			self.decoder = state.decoder.copy()
+		else:
+			self.decoder = None
 
 	##
 	# Generic update call for state transitions
@@ -80,6 +117,14 @@ class State:
 		# Insert into bitmap of component failures
 		self.failed_comp = bm_insert(self.failed_comp, component_id)
 		self.avail_comp = bm_rm(self.avail_comp, component_id)	
+
+		# Move from the available to the failed list
+		self.failed_flags[component_id] = True
+		del self.avail_list[bisect_left(self.avail_list, component_id)]
+		insort(self.failed_list, component_id)
+
+		if self.decoder is not None:
+			self.decoder.fail_disk(component_id)
 		
 		# Incrememnt component failure count
 		self.num_failed_comp += 1
@@ -95,6 +140,14 @@ class State:
 		self.failed_comp = bm_rm(self.failed_comp, component_id)	
 		self.avail_comp = bm_insert(self.avail_comp, component_id)
 
+		# Move from the failed to the available list
+		self.failed_flags[component_id] = False
+		del self.failed_list[bisect_left(self.failed_list, component_id)]
+		insort(self.avail_list, component_id)
+
+		if self.decoder is not None:
+			self.decoder.repair_disk(component_id)
+
 		# Decrement component failure count
 		self.num_failed_comp -= 1
 		
@@ -107,17 +160,41 @@ class State:
 	def get_num_component_fail(self):
 		return self.num_failed_comp
 
+	def get_num_component_avail(self):
+		return self.num_components - self.num_failed_comp
+
+	def is_component_failed(self, component_id):
+		return self.failed_flags[component_id]
+
 	##
-	# Return a list of component IDs of failed components
+	# Return a list of component IDs of failed components (sorted; the
+	# list belongs to the State and must not be modified)
 	#
 	def get_failed_components(self):
-		return bm_to_list(self.failed_comp)
+		return self.failed_list
 
 	##
-	# Return a list of component IDs of available components
+	# Return a list of component IDs of available components (sorted; 
+	# the list belongs to the State and must not be modified)
 	#
 	def get_avail_components(self):
-		return bm_to_list(self.avail_comp)
+		return self.avail_list
+
+	##
+	# The index-th failed (available) component, e.g. to pick one at 
+	# random
+	#
+	def get_failed_component(self, index):
+		return self.failed_list[index]
+
+	def get_avail_component(self, index):
+		return self.avail_list[index]
+
+	##
+	# Whether the failed components lose data, from the decoder
+	#
+	def is_data_lost(self):
+		return self.decoder.is_failure()
 
 	##
 	# Return the current system state
@@ -1,5 +1,6 @@
 from poisson_process import *
 from simulation import *
+from event_calendar import EventCalendar
 from numpy import random
 
 class UniformizationBFBOpt(Simulation):
@@ -15,12 +16,12 @@ class UniformizationBFBOpt(Simulation):
          ##
          # Get the maximum outgoing rate of any state over the mission time (beta)
          #
-         self.poisson_rate = mpf(0)
+         self.poisson_rate = arith.real(0)
 
          ##
          # The minimum hazard rate for rebuilds
          #
-         self.min_rebuild_rate = mpf(1)
+         self.min_rebuild_rate = arith.real(1)
 
          logging.debug("Finding maximum rate for the Poisson process")
          
@@ -36,12 +37,18 @@ class UniformizationBFBOpt(Simulation):
          
          # Set up structure for component repairs
          self.component_repair_start = [0 for i in range(len(self.components))]
+
+         # Pending repairs of failed components
+         self.repair_calendar = EventCalendar(len(self.components))
+
+         # Skip-ahead sampler for the all-healthy state
+         self.first_failure = FirstFailureSampler(self.components)
           
          # Initialize the state of the system
-         self.state = State([i for i in range(self.num_components)])
+         self.state = State([i for i in range(self.num_components)], self.eras_code.new_decoder(self.num_components))
 
          # Likelihood ratio
-         self.lr = mpf(1)
+         self.reset_lr()
      
     ##
     # Reset the simulator
@@ -50,49 +57,37 @@ class UniformizationBFBOpt(Simulation):
          # Generate next failure event
 
           # Reset clocks and state
-          for component in self.components:
-                component.init_clock(0)
-                component.init_state()
+          self.component_table.reset(0)
           
           # Reset system state
-          self.state = State(self.components)
+          self.state.reset()
+          self.repair_calendar.clear()
 
           # Reset LR
-          self.lr = mpf(1) 
+          self.reset_lr()
+
+          # Biased draws made (and how many were failures), for tuning fb_prob
+          self.num_fb_draws = 0
+          self.num_fb_fails = 0
         
     ##
     # Get failure rate
     #
     def get_fail_rate(self):
-        fail_rate = mpf(0)
-        for component in self.components:
-                fail_rate += component.curr_component_fail_rate()
-
-        return fail_rate
+        return self.component_table.total_fail_rate()
     ##
     # Set new component repair time for component comp_idx
     #
     def set_comp_repair(self, comp_idx, curr_time):
         self.component_repairs[comp_idx] = self.components[comp_idx].component_repair_distr.draw() + curr_time
         self.component_repair_start[comp_idx] = curr_time 
+        self.repair_calendar.schedule(comp_idx, self.component_repairs[comp_idx])
          
-   ##
-    # Get the next repair event
+    ##
+    # Get the next repair event (earliest repair of a failed component)
     #
-    def get_next_repair(self, failed_comps):
-        
-        if len(failed_comps) == 0:
-            return (None, None)
-        
-        comp_idx = failed_comps[0]
-        repair_time = self.component_repairs[failed_comps[0]]
-        
-        for i in failed_comps[1:]:
-            if self.component_repairs[i] < repair_time and self.component_repairs[i] > 0:
-                comp_idx = i
-                repair_time = self.component_repairs[i]
-        
-        return (repair_time, comp_idx)
+    def get_next_repair(self, failed_comps=None):
+        return self.repair_calendar.peek()
 
     ##
     # Get the next event
@@ -102,17 +97,8 @@ class UniformizationBFBOpt(Simulation):
          # If not in a failed state, then draw for next device failure
          if self.state.get_sys_state() == self.state.CURR_STATE_OK:
               avail_comps = self.state.get_avail_components()
-              next_event_comp = 0
-              clock_val = self.components[0].read_clock()
-              next_event_time = self.components[0].component_fail_distr.draw_inverse_transform(clock_val) + curr_time
-              
-              for comp_idx in range(1, len(self.components)):
-                    clock_val = self.components[comp_idx].read_clock()
-                    event_time = self.components[comp_idx].component_fail_distr.draw_inverse_transform(clock_val) + curr_time
-                    
-                    if event_time < next_event_time:
-                         next_event_time = event_time
-                         next_event_comp = comp_idx
+              (wait_time, next_event_comp) = self.first_failure.draw(avail_comps)
+              next_event_time = wait_time + curr_time
                          
               # Update internal component state
               self.components[next_event_comp].fail_component(next_event_time)
@@ -126,37 +112,39 @@ class UniformizationBFBOpt(Simulation):
 
              next_event_time = random.exponential(1/self.poisson_rate) + curr_time
              
-             (repair_time, comp_idx) = self.get_next_repair(self.state.get_failed_components())
+             (repair_time, comp_idx) = self.get_next_repair()
              
              if repair_time < next_event_time:
                  # Update internal component state
                 self.components[comp_idx].repair_component()
+                self.repair_calendar.cancel(comp_idx)
                 event_type = Component.EVENT_COMP_REPAIR
                     
                 return (repair_time, Component.EVENT_COMP_REPAIR, comp_idx)
              
              # Update all component clocks
-             for component in self.components:
-                component.update_clock(next_event_time)
+             self.sim_clock.update(next_event_time)
              
              draw = random.uniform()
+             self.num_fb_draws += 1
              # Determine if it is a "real" event or "pseudo" event
              if draw > self.fb_prob:
                  # It is a pseudo event 
                  # Update the LR to deal with this
-                 self.lr *=  ((1 - (self.get_fail_rate()/self.poisson_rate)) / (1 - self.fb_prob))
+                 self.scale_lr((1 - (self.get_fail_rate()/self.poisson_rate)) / (1 - self.fb_prob))
 
                  # Return nothing, since we are staying in the current state
                  return (next_event_time, None, None)
 
              else:
-                 
-                avail_comps = self.state.get_avail_components()
-                comp_idx = avail_comps[random.randint(0, len(avail_comps))]
+                self.num_fb_fails += 1
+
+                num_avail = self.state.get_num_component_avail()
+                comp_idx = self.state.get_avail_component(random.randint(0, num_avail))
                 
                 
                 # Update the LR to deal with this
-                self.lr *= ((self.components[comp_idx].curr_component_fail_rate()/self.poisson_rate) / (self.fb_prob /len(avail_comps)))
+                self.scale_lr((self.components[comp_idx].curr_component_fail_rate()/self.poisson_rate) / (self.fb_prob /num_avail))
                      
                 # Update internal component state
                 self.components[comp_idx].fail_component(next_event_time)
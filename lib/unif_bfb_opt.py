@@ -46,7 +46,7 @@ class UniformizationBFBOpt(Simulation):
          self.fb_prob = self.is_parms.fb_prob
           
          # Initialize the state of the system
-         self.state = State([i for i in range(self.num_components)])
+         self.state = State([i for i in range(self.num_components)], self.eras_code.new_decoder(self.num_components))
 
          # Likelihood ratio
          self.lr = mpf(1)
@@ -58,12 +58,10 @@ class UniformizationBFBOpt(Simulation):
          # Generate next failure event
 
           # Reset clocks and state
-          for component in self.components:
-                component.init_clock(0)
-                component.init_state()
+          self.component_table.reset(0)
           
           # Reset system state
-          self.state = State(self.components)
+          self.state.reset()
 
           # Reset LR
           self.lr = mpf(1) 
@@ -223,7 +221,7 @@ class UniformizationBFBOpt(Simulation):
                 logging.debug("Components failed : %s" % failed_comps)
 
                 # Check to see if we are in the "failed" state
-                if self.eras_code.is_failure(failed_comps) is True:
+                if self.is_disk_failure(failed_comps) is True:
                     logging.debug("LR : %e" % self.lr)
                     return self.lr
 